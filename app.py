@@ -1,16 +1,43 @@
 import os
+import re
+import sys
+import csv
+import gzip
 import json
+import math
+import mmap
+import zlib
+import socket
+import struct
+import time
+import heapq
 import sqlite3
 import hashlib
 import secrets
+import threading
+from contextlib import contextmanager
+from collections import OrderedDict
+from urllib.parse import urlparse
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
+import msgpack
 import requests
 from flask import Flask, request, jsonify, render_template, session, redirect, url_for, flash
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from werkzeug.security import generate_password_hash, check_password_hash
 import logging
 
+try:
+    import fcntl
+except ImportError:  # Windows: shared-memory cache backend unavailable
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # -------------------------
 # App Configuration
 # -------------------------
@@ -25,11 +52,118 @@ VOICE_API_KEY = "f9c49e723255a24404d570c570f71470b23a715d03949924705e40ddc575b11
 WEATHER_API_KEY = "your_weather_api_key"  # Replace with actual key
 MARKET_API_KEY = "your_market_api_key"    # Replace with actual key
 
+# Upstream LLM admission control (see "LLM Admission Control" below)
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 8))      # in-flight Gemini calls
+LLM_GLOBAL_RATE = float(os.environ.get('LLM_GLOBAL_RATE', 4.0))          # requests/second, all users
+LLM_GLOBAL_BURST = int(os.environ.get('LLM_GLOBAL_BURST', 10))
+LLM_USER_RATE = float(os.environ.get('LLM_USER_RATE', 0.2))              # requests/second, per user
+LLM_USER_BURST = int(os.environ.get('LLM_USER_BURST', 5))
+LLM_USER_MAX_PENDING = int(os.environ.get('LLM_USER_MAX_PENDING', 2))    # fair share: queued + in-flight
+LLM_QUEUE_MAX = int(os.environ.get('LLM_QUEUE_MAX', 64))
+LLM_QUEUE_TIMEOUT = float(os.environ.get('LLM_QUEUE_TIMEOUT', 20.0))     # seconds a request may wait
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # lets monitoring scrape /api/metrics without a session
+# Phone numbers of extension officers allowed to search every farmer's chat history
+EXTENSION_OFFICER_PHONES = {p.strip() for p in os.environ.get('EXTENSION_OFFICER_PHONES', '').split(',') if p.strip()}
+
+# District advisory bulletins (see "District Advisory Bulletins" below)
+ADVISORY_REFRESH_HOURS = float(os.environ.get('ADVISORY_REFRESH_HOURS', 6))
+ADVISORY_LANGUAGES = ('en', 'ml')
+
+# Location resolution for weather (see "Weather Grid" below)
+PINCODE_DATA_PATH = os.environ.get(
+    'PINCODE_DATA_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'kerala_pincodes.csv'))
+WEATHER_GRID_DEG = float(os.environ.get('WEATHER_GRID_DEG', 0.1))  # cell size in degrees (~11 km)
+
+# Database maintenance (see "Database Maintenance" below). Retention of 0 keeps rows forever.
+RETENTION_POLICIES = {
+    'chat_history': {'days': int(os.environ.get('RETENTION_CHAT_HISTORY_DAYS', 365)), 'column': 'timestamp', 'archive': True},
+    'market_prices': {'days': int(os.environ.get('RETENTION_MARKET_PRICES_DAYS', 90)), 'column': 'timestamp', 'archive': True, 'cache': 'market'},
+    'advisory_bulletins': {'days': int(os.environ.get('RETENTION_ADVISORY_DAYS', 30)), 'column': 'generated_at', 'archive': True},
+    'weather_cache': {'days': int(os.environ.get('RETENTION_WEATHER_CACHE_DAYS', 2)), 'column': 'timestamp', 'archive': False, 'cache': 'weather'},
+}
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+MAINTENANCE_INTERVAL_MINUTES = float(os.environ.get('MAINTENANCE_INTERVAL_MINUTES', 15))
+MAINTENANCE_BATCH_ROWS = int(os.environ.get('MAINTENANCE_BATCH_ROWS', 500))
+MAINTENANCE_MAX_BATCHES = int(os.environ.get('MAINTENANCE_MAX_BATCHES', 200))     # per table per run
+MAINTENANCE_PAUSE_SECONDS = float(os.environ.get('MAINTENANCE_PAUSE_SECONDS', 0.05))
+MAINTENANCE_VACUUM_PAGES = int(os.environ.get('MAINTENANCE_VACUUM_PAGES', 256))
+ANALYZE_INTERVAL_HOURS = float(os.environ.get('ANALYZE_INTERVAL_HOURS', 24))
+
+# Shared cache (see "Shared Cache" below): lru (per process), shm (per host) or redis (multi-node)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'lru').lower()
+CACHE_PREFIX = os.environ.get('CACHE_PREFIX', 'ks')
+CACHE_LRU_ITEMS = int(os.environ.get('CACHE_LRU_ITEMS', 10000))
+CACHE_SHM_PATH = os.environ.get('CACHE_SHM_PATH', '/dev/shm/krishi_sakhi_cache' if os.path.isdir('/dev/shm') else 'krishi_sakhi_cache.shm')
+CACHE_SHM_SLOTS = int(os.environ.get('CACHE_SHM_SLOTS', 8192))
+CACHE_SHM_SLOT_BYTES = int(os.environ.get('CACHE_SHM_SLOT_BYTES', 4096))
+CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+CACHE_COMPRESS_MIN_BYTES = 1024
+CACHE_TTLS = {'weather': 300, 'market': 300, 'users': 60}  # seconds, per namespace
+
+# API response encoding (see "JSON Responses" below)
+API_COMPRESSION = os.environ.get('API_COMPRESSION', 'gzip').lower()  # gzip or none
+API_GZIP_MIN_BYTES = int(os.environ.get('API_GZIP_MIN_BYTES', 1024))
+API_GZIP_LEVEL = int(os.environ.get('API_GZIP_LEVEL', 5))
+
+# -------------------------
+# JSON Responses
+# -------------------------
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Compact UTF-8 JSON, encoded with orjson when it is installed.
+
+    Unlike Flask's default, Malayalam text is not escaped to \\uXXXX (which
+    doubles its size), keys are not sorted and output is never indented.
+    """
+
+    ensure_ascii = False
+    sort_keys = False
+    compact = True
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME if orjson else 0
+
+    def _dump_bytes(self, obj: Any) -> bytes:
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=self.default, option=self._ORJSON_OPTIONS)
+            except TypeError:
+                pass  # e.g. integers beyond 64 bits - let the stdlib handle it
+        return json.dumps(obj, default=self.default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            kwargs.setdefault('default', self.default)
+            kwargs.setdefault('ensure_ascii', False)
+            return json.dumps(obj, **kwargs)
+        return self._dump_bytes(obj).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self._dump_bytes(obj), mimetype=self.mimetype)
+
+
+def compress_api_response(response):
+    """gzip large JSON responses for clients that accept it"""
+    if (API_COMPRESSION != 'gzip' or not request.path.startswith('/api/')
+            or response.direct_passthrough or response.mimetype != 'application/json'
+            or 'Content-Encoding' in response.headers):
+        return response
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:  # honours q-values, so "gzip;q=0" opts out
+        return response
+    body = response.get_data()
+    if len(body) < API_GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, API_GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    return response
+
 # -------------------------
 # Flask app setup
 # -------------------------
 app = Flask(__name__)
 app.secret_key = secrets.token_hex(32)
+app.json = FastJSONProvider(app)
+app.after_request(compress_api_response)
 CORS(app)
 
 # Configure logging
@@ -39,11 +173,71 @@ logger = logging.getLogger(__name__)
 # -------------------------
 # Database setup
 # -------------------------
+# unicode61 treats Malayalam vowel signs and virama as separators, splitting every
+# word into bare consonants. Declare the whole Malayalam block plus ZWNJ/ZWJ
+# (used in chillu and conjunct spellings) as token characters instead.
+MALAYALAM_TOKENCHARS = ''.join(chr(c) for c in range(0x0D00, 0x0D80)) + '\u200c\u200d'
+CHAT_FTS_TOKENIZE = f"porter unicode61 remove_diacritics 2 tokenchars '{MALAYALAM_TOKENCHARS}'"
+CHAT_FTS_ENABLED = False
+
+def init_chat_history_fts(cursor) -> bool:
+    """Create the FTS5 index over chat_history and its sync triggers.
+
+    user_id is indexed as a token so a farmer's search can be scoped with a
+    MATCH term. Officer searches across all users are where the index pays
+    off; a single user's few hundred rows are cheap to scan either way.
+    """
+    exists = cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chat_history_fts'"
+    ).fetchone()
+    try:
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS chat_history_fts USING fts5(
+                message, response, user_id,
+                content='chat_history', content_rowid='id',
+                tokenize="{CHAT_FTS_TOKENIZE}"
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning(f"FTS5 unavailable, chat history search falls back to LIKE: {e}")
+        return False
+    
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_history_fts_ai AFTER INSERT ON chat_history BEGIN
+            INSERT INTO chat_history_fts (rowid, message, response, user_id)
+            VALUES (new.id, new.message, new.response, new.user_id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_history_fts_ad AFTER DELETE ON chat_history BEGIN
+            INSERT INTO chat_history_fts (chat_history_fts, rowid, message, response, user_id)
+            VALUES ('delete', old.id, old.message, old.response, old.user_id);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS chat_history_fts_au AFTER UPDATE OF message, response, user_id ON chat_history BEGIN
+            INSERT INTO chat_history_fts (chat_history_fts, rowid, message, response, user_id)
+            VALUES ('delete', old.id, old.message, old.response, old.user_id);
+            INSERT INTO chat_history_fts (rowid, message, response, user_id)
+            VALUES (new.id, new.message, new.response, new.user_id);
+        END
+    ''')
+    
+    if not exists:
+        # Index rows written before the FTS table existed
+        cursor.execute("INSERT INTO chat_history_fts (chat_history_fts) VALUES ('rebuild')")
+    return True
+
 def init_db():
     """Initialize SQLite database with required tables"""
     conn = sqlite3.connect('krishi_sakhi.db')
     cursor = conn.cursor()
     
+    # New databases start in incremental auto-vacuum mode (existing ones are
+    # converted offline with --convert-incremental-vacuum)
+    if not cursor.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchone():
+        cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -114,12 +308,616 @@ def init_db():
         )
     ''')
     
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_chat_history_user ON chat_history (user_id, timestamp)')
+    
+    # Full-text index over chat history
+    global CHAT_FTS_ENABLED
+    CHAT_FTS_ENABLED = init_chat_history_fts(cursor)
+    
+    # Precomputed district advisory bulletins (versioned per generation run)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS advisory_bulletins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            district TEXT NOT NULL,
+            language TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            generated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE (district, language, version)
+        )
+    ''')
+    
     conn.commit()
     conn.close()
 
 # Initialize database on startup
 init_db()
 
+# -------------------------
+# Weather Grid
+# -------------------------
+# Common alternate spellings of Kerala district names
+DISTRICT_ALIASES = {
+    "trivandrum": "thiruvananthapuram",
+    "quilon": "kollam",
+    "alleppey": "alappuzha",
+    "alapuzha": "alappuzha",
+    "kochi": "ernakulam",
+    "cochin": "ernakulam",
+    "trichur": "thrissur",
+    "thrisur": "thrissur",
+    "palghat": "palakkad",
+    "palakad": "palakkad",
+    "calicut": "kozhikode",
+    "kozhikkode": "kozhikode",
+    "wynad": "wayanad",
+    "cannanore": "kannur",
+    "kasargod": "kasaragod",
+    "kasargode": "kasaragod",
+}
+
+_PINCODE_RE = re.compile(r'^\d{6}$')
+
+
+def normalize_place(name: str) -> str:
+    """Lower-case place name reduced to letters, with aliases applied"""
+    place = (name or "").split(",")[0]
+    place = re.sub(r'[^a-z\u0d00-\u0d7f]', '', place.lower().replace("district", ""))
+    return DISTRICT_ALIASES.get(place, place)
+
+
+class WeatherGrid:
+    """
+    Spatial index mapping pincodes and district names to fixed-size lat/lon
+    cells. Every location in the same cell shares one cached forecast.
+    """
+
+    def __init__(self, cell_deg: float):
+        self.cell_deg = cell_deg
+        self._pincodes: Dict[str, tuple] = {}   # pincode -> (lat, lon, district)
+        self._prefixes: Dict[str, tuple] = {}   # 3-digit sorting district -> centroid, if within one district
+        self._districts: Dict[str, tuple] = {}  # normalized name -> (lat, lon, display name)
+        self._labels: Dict[str, str] = {}       # cell id -> district label
+        self._resolved: Dict[str, Optional[Dict]] = {}
+
+    def __len__(self):
+        return len(self._pincodes)
+
+    @classmethod
+    def load(cls, path: str, cell_deg: float) -> 'WeatherGrid':
+        """Load a CSV with pincode, district, latitude and longitude columns"""
+        grid = cls(cell_deg)
+        try:
+            with open(path, newline='', encoding='utf-8') as f:
+                for row in csv.DictReader(f):
+                    try:
+                        grid._pincodes[row['pincode'].strip()] = (
+                            float(row['latitude']), float(row['longitude']), row['district'].strip())
+                    except (KeyError, TypeError, ValueError):
+                        continue
+        except OSError as e:
+            logger.warning(f"Pincode dataset unavailable ({e}); weather is keyed by location text")
+        grid._build()
+        logger.info(f"Weather grid: {len(grid._pincodes)} pincodes, {len(grid._districts)} districts, {len(grid._labels)} cells")
+        return grid
+
+    def _build(self):
+        def centroid(points):
+            return (sum(p[0] for p in points) / len(points), sum(p[1] for p in points) / len(points))
+
+        by_prefix: Dict[str, List[tuple]] = {}
+        by_district: Dict[str, List[tuple]] = {}
+        cell_districts: Dict[str, Dict[str, int]] = {}
+        for pincode, point in self._pincodes.items():
+            by_prefix.setdefault(pincode[:3], []).append(point)
+            by_district.setdefault(normalize_place(point[2]), []).append(point)
+            counts = cell_districts.setdefault(self._cell_id(point[0], point[1]), {})
+            counts[point[2]] = counts.get(point[2], 0) + 1
+
+        # A prefix spanning several districts (673xxx: Kozhikode and Wayanad) has a
+        # centroid in neither, so those pincodes fall back to the user's district instead
+        self._prefixes = {
+            prefix: centroid(points) for prefix, points in by_prefix.items()
+            if len({normalize_place(p[2]) for p in points}) == 1
+        }
+        self._districts = {key: (*centroid(points), points[0][2]) for key, points in by_district.items()}
+        self._labels = {cell: max(counts, key=counts.get) for cell, counts in cell_districts.items()}
+        # District centroids may fall in a cell with no pincode of its own
+        for lat, lon, name in self._districts.values():
+            self._labels.setdefault(self._cell_id(lat, lon), name)
+        self._resolved.clear()
+
+    def _cell_id(self, lat: float, lon: float) -> str:
+        return f"cell:{math.floor(lat / self.cell_deg)}:{math.floor(lon / self.cell_deg)}"
+
+    def cell_at(self, lat: float, lon: float) -> Dict:
+        """Canonical cell containing a coordinate"""
+        row, col = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+        cell_id = f"cell:{row}:{col}"
+        return {
+            "id": cell_id,
+            "lat": round((row + 0.5) * self.cell_deg, 4),
+            "lon": round((col + 0.5) * self.cell_deg, 4),
+            "label": self._labels.get(cell_id),
+        }
+
+    def resolve(self, location: str) -> Optional[Dict]:
+        """Resolve a pincode or district name to its weather cell, or None if unknown"""
+        location = (location or "").strip()
+        if location in self._resolved:
+            return self._resolved[location]
+
+        point = None
+        if _PINCODE_RE.match(location):
+            point = self._pincodes.get(location) or self._prefixes.get(location[:3])
+        else:
+            point = self._districts.get(normalize_place(location))
+        cell = self.cell_at(point[0], point[1]) if point else None
+
+        if len(self._resolved) < 100_000:
+            self._resolved[location] = cell
+        return cell
+
+
+weather_grid = WeatherGrid.load(PINCODE_DATA_PATH, WEATHER_GRID_DEG)
+
+
+def weather_cache_key(location: str) -> str:
+    """Cache key shared by every spelling/pincode that maps to the same place"""
+    cell = weather_grid.resolve(location)
+    return cell["id"] if cell else f"loc:{normalize_place(location) or (location or '').strip().lower()}"
+
+# -------------------------
+# Shared Cache
+# -------------------------
+class CacheUnavailable(Exception):
+    """Raised by a cache backend that cannot reach its store"""
+
+
+def cache_dumps(value: Any) -> bytes:
+    """Compact binary encoding: format byte, flags byte, payload (zlib if large)"""
+    fmt, body = b'P', msgpack.packb(value, use_bin_type=True)
+    if len(body) >= CACHE_COMPRESS_MIN_BYTES:
+        return fmt + b'z' + zlib.compress(body, 1)
+    return fmt + b'-' + body
+
+
+def cache_loads(data: bytes) -> Any:
+    """Inverse of cache_dumps()"""
+    fmt, flags, body = data[:1], data[1:2], data[2:]
+    if flags == b'z':
+        body = zlib.decompress(body)
+    if fmt != b'P':
+        raise ValueError(f"unknown cache payload format {fmt!r}")
+    return msgpack.unpackb(body, raw=False)
+
+
+class CacheBackend:
+    """Byte-level key/value store with TTLs. Subclasses override the operations."""
+
+    # True when the backend pushes invalidations, so namespace versions can be held locally
+    push_invalidation = False
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: str):
+        pass
+
+    def subscribe(self, channel: str, callback):
+        pass
+
+
+class LRUCacheBackend(CacheBackend):
+    """In-process LRU; every worker has its own copy"""
+
+    def __init__(self, max_items: int):
+        self.max_items = max_items
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[1] is not None and item[1] < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return item[0]
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        with self._lock:
+            self._items[key] = (value, time.time() + ttl if ttl else None)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            value = int(self._items.get(key, (b'0', None))[0]) + 1
+            self._items[key] = (str(value).encode(), None)
+            return value
+
+
+class SharedMemoryCacheBackend(CacheBackend):
+    """
+    Fixed-size hash table in a memory-mapped file (in /dev/shm by default),
+    shared by all worker processes on one host.
+
+    Each slot holds one entry. Readers are lock-free: a per-slot sequence
+    number is odd while a write is in progress and readers retry if it changed
+    under them. Writers serialise on flock(). A full probe window evicts the
+    first ordinary entry in it; counters written by incr() (namespace versions)
+    are pinned and never evicted, or old versions could be handed out again.
+    """
+
+    _HEADER = struct.Struct('<IIQdIH2x')  # seq, flags, key hash, expires, value len, key len
+    _PINNED = 1
+    _PROBE = 4
+    _NO_EXPIRY = 1e18
+
+    def __init__(self, path: str, slots: int, slot_bytes: int):
+        if fcntl is None:
+            raise CacheUnavailable("shared-memory cache requires fcntl (POSIX)")
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        size = slots * slot_bytes
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        self._lock = threading.Lock()  # flock does not exclude threads sharing the fd
+        with self._write_lock():
+            if os.fstat(self._fd).st_size < size:
+                os.ftruncate(self._fd, size)
+        self._mm = mmap.mmap(self._fd, size)
+
+    @contextmanager
+    def _write_lock(self):
+        with self._lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _hash(key: bytes) -> int:
+        # Stable across processes, unlike hash()
+        return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little')
+
+    def _offsets(self, key_hash: int):
+        home = key_hash % self.slots
+        return [((home + i) % self.slots) * self.slot_bytes for i in range(self._PROBE)]
+
+    def get(self, key: str) -> Optional[bytes]:
+        kb = key.encode()
+        key_hash = self._hash(kb)
+        for offset in self._offsets(key_hash):
+            for _ in range(8):
+                seq, _, slot_hash, expires, vlen, klen = self._HEADER.unpack_from(self._mm, offset)
+                if seq & 1:
+                    continue  # write in progress
+                if slot_hash != key_hash or klen != len(kb):
+                    break
+                start = offset + self._HEADER.size
+                data = self._mm[start:start + klen + vlen]
+                if self._HEADER.unpack_from(self._mm, offset)[0] != seq:
+                    continue  # torn read
+                if data[:klen] != kb:
+                    break
+                return data[klen:] if expires > time.time() else None
+        return None
+
+    def _find_slot(self, kb: bytes, key_hash: int, now: float) -> Optional[int]:
+        """Slot holding kb, else a free slot, else an evictable one (None if all are pinned)"""
+        free = victim = None
+        for offset in self._offsets(key_hash):
+            _, flags, slot_hash, expires, _, klen = self._HEADER.unpack_from(self._mm, offset)
+            if slot_hash == key_hash and klen == len(kb):
+                start = offset + self._HEADER.size
+                if self._mm[start:start + klen] == kb:
+                    return offset
+            if flags & self._PINNED:
+                continue
+            if free is None and expires <= now:
+                free = offset
+            if victim is None:
+                victim = offset
+        return victim if free is None else free
+
+    def _write(self, offset: int, kb: bytes, key_hash: int, value: bytes, expires: float, flags: int = 0):
+        seq = self._HEADER.unpack_from(self._mm, offset)[0]
+        struct.pack_into('<I', self._mm, offset, seq + 1)
+        start = offset + self._HEADER.size
+        self._mm[start:start + len(kb) + len(value)] = kb + value
+        self._HEADER.pack_into(self._mm, offset, seq + 1, flags, key_hash, expires, len(value), len(kb))
+        struct.pack_into('<I', self._mm, offset, seq + 2)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        kb = key.encode()
+        if self._HEADER.size + len(kb) + len(value) > self.slot_bytes:
+            return False
+        key_hash = self._hash(kb)
+        with self._write_lock():
+            now = time.time()
+            offset = self._find_slot(kb, key_hash, now)
+            if offset is None:
+                return False
+            self._write(offset, kb, key_hash, value, now + ttl if ttl else self._NO_EXPIRY)
+        return True
+
+    def delete(self, key: str):
+        kb = key.encode()
+        key_hash = self._hash(kb)
+        with self._write_lock():
+            offset = self._find_slot(kb, key_hash, time.time())
+            if offset is not None and self._HEADER.unpack_from(self._mm, offset)[2] == key_hash:
+                self._write(offset, kb, key_hash, b'', 0.0)
+
+    def incr(self, key: str) -> int:
+        kb = key.encode()
+        key_hash = self._hash(kb)
+        with self._write_lock():
+            now = time.time()
+            offset = self._find_slot(kb, key_hash, now)
+            if offset is None:
+                raise CacheUnavailable("no evictable slot for counter")
+            _, _, slot_hash, expires, vlen, klen = self._HEADER.unpack_from(self._mm, offset)
+            value = 0
+            if slot_hash == key_hash and expires > now:
+                start = offset + self._HEADER.size + klen
+                value = int(self._mm[start:start + vlen] or b'0')
+            value += 1
+            self._write(offset, kb, key_hash, str(value).encode(), self._NO_EXPIRY, self._PINNED)
+            return value
+
+
+class RedisError(Exception):
+    """Error reply from a Redis-protocol server"""
+
+
+class RedisCacheBackend(CacheBackend):
+    """
+    Minimal RESP2 client (GET/SET/DEL/INCR/PUBLISH/SUBSCRIBE) against Redis or
+    any server speaking the protocol. One connection per thread; network
+    failures surface as CacheUnavailable so callers fall through to the database.
+    After a failure the backend stops trying for `cooldown` seconds instead of
+    paying a connect timeout on every request while the server is down.
+    """
+
+    push_invalidation = True
+
+    def __init__(self, url: str, timeout: float = 0.5, cooldown: float = 5.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or '/0').lstrip('/') or 0)
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self._down_until = 0.0
+        self._local = threading.local()
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(out)
+
+    @classmethod
+    def _read(cls, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest
+        if kind == b'-':
+            raise RedisError(rest.decode(errors='replace'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            return None if length < 0 else reader.read(length + 2)[:-2]
+        if kind == b'*':
+            length = int(rest)
+            return None if length < 0 else [cls._read(reader) for _ in range(length)]
+        raise ConnectionError(f"unexpected reply {line[:20]!r}")
+
+    def _connect(self, timeout: Optional[float]):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        sock.settimeout(timeout)
+        reader = sock.makefile('rb')
+        if self.password:
+            sock.sendall(self._encode('AUTH', self.password))
+            self._read(reader)
+        if self.db:
+            sock.sendall(self._encode('SELECT', self.db))
+            self._read(reader)
+        return sock, reader
+
+    def _command(self, *args):
+        if time.monotonic() < self._down_until:
+            raise CacheUnavailable("redis unavailable, retrying after cooldown")
+        conn = getattr(self._local, 'conn', None)
+        try:
+            if conn is None:
+                conn = self._local.conn = self._connect(self.timeout)
+            conn[0].sendall(self._encode(*args))
+            return self._read(conn[1])
+        except (OSError, ConnectionError, ValueError) as e:
+            if conn is not None:
+                conn[0].close()
+            self._local.conn = None
+            if time.monotonic() >= self._down_until:
+                logger.warning(f"Redis cache unavailable ({e}); retrying in {self.cooldown:g}s")
+            self._down_until = time.monotonic() + self.cooldown
+            raise CacheUnavailable(str(e))
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command('GET', key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> bool:
+        if ttl:
+            self._command('SET', key, value, 'PX', int(ttl * 1000))
+        else:
+            self._command('SET', key, value)
+        return True
+
+    def delete(self, key: str):
+        self._command('DEL', key)
+
+    def incr(self, key: str) -> int:
+        return self._command('INCR', key)
+
+    def publish(self, channel: str, message: str):
+        self._command('PUBLISH', channel, message)
+
+    def subscribe(self, channel: str, callback):
+        def listen():
+            backoff, logged_at = 1.0, None
+            while True:
+                try:
+                    sock, reader = self._connect(None)
+                    sock.sendall(self._encode('SUBSCRIBE', channel))
+                    while True:
+                        reply = self._read(reader)
+                        if reply and reply[0] == b'message':
+                            callback(reply[2].decode())
+                        elif reply and reply[0] == b'subscribe':
+                            backoff = 1.0
+                except Exception as e:
+                    # Log at most once a minute while the server stays down
+                    if logged_at is None or time.monotonic() - logged_at >= 60:
+                        logger.warning(f"Cache invalidation subscriber disconnected: {e}")
+                        logged_at = time.monotonic()
+                # Messages may have been missed while disconnected
+                callback(None)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+        threading.Thread(target=listen, name="cache-invalidation", daemon=True).start()
+
+
+class SharedCache:
+    """
+    Namespaced object cache over a CacheBackend.
+
+    Keys are "<prefix>:<namespace>:v<version>:<key>". invalidate(namespace)
+    bumps the namespace version in the backend, orphaning every old entry at
+    once, and broadcasts the new version so other processes and nodes stop
+    reading old keys immediately. Backend outages degrade to cache misses.
+    """
+
+    def __init__(self, backend: CacheBackend, prefix: str = 'ks'):
+        self.backend = backend
+        self.prefix = prefix
+        self._versions: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._channel = f"{prefix}:invalidate"
+        if backend.push_invalidation:
+            backend.subscribe(self._channel, self._on_invalidate)
+
+    def _on_invalidate(self, message: Optional[str]):
+        if message is None:
+            self._versions.clear()  # resubscribed: re-read versions from the backend
+            return
+        namespace, _, version = message.rpartition(':')
+        if int(version) > self._versions.get(namespace, -1):
+            self._versions[namespace] = int(version)
+
+    def _count(self, namespace: str, outcome: str):
+        counts = self._stats.setdefault(namespace, {"hits": 0, "misses": 0, "errors": 0})
+        counts[outcome] += 1
+
+    def _version(self, namespace: str) -> int:
+        if self.backend.push_invalidation and namespace in self._versions:
+            return self._versions[namespace]
+        version = int(self.backend.get(f"{self.prefix}:{namespace}:version") or 0)
+        if self.backend.push_invalidation:
+            self._versions[namespace] = version
+        return version
+
+    def _key(self, namespace: str, key: Any) -> str:
+        return f"{self.prefix}:{namespace}:v{self._version(namespace)}:{key}"
+
+    def get(self, namespace: str, key: Any, default: Any = None) -> Any:
+        try:
+            data = self.backend.get(self._key(namespace, key))
+            if data is None:
+                self._count(namespace, "misses")
+                return default
+            value = cache_loads(data)
+        except (CacheUnavailable, RedisError, ValueError, EOFError, TypeError, zlib.error) as e:
+            logger.debug(f"Cache get failed ({namespace}): {e}")
+            self._count(namespace, "errors")
+            return default
+        self._count(namespace, "hits")
+        return value
+
+    def set(self, namespace: str, key: Any, value: Any, ttl: Optional[float] = None):
+        ttl = CACHE_TTLS.get(namespace) if ttl is None else ttl
+        try:
+            self.backend.set(self._key(namespace, key), cache_dumps(value), ttl)
+        except (CacheUnavailable, RedisError, ValueError) as e:
+            logger.debug(f"Cache set failed ({namespace}): {e}")
+            self._count(namespace, "errors")
+
+    def delete(self, namespace: str, key: Any):
+        try:
+            self.backend.delete(self._key(namespace, key))
+        except (CacheUnavailable, RedisError) as e:
+            logger.debug(f"Cache delete failed ({namespace}): {e}")
+            self._count(namespace, "errors")
+
+    def invalidate(self, namespace: str) -> Optional[int]:
+        """Drop every entry in a namespace, on all processes sharing the backend"""
+        try:
+            version = self.backend.incr(f"{self.prefix}:{namespace}:version")
+            self._versions[namespace] = version
+            self.backend.publish(self._channel, f"{namespace}:{version}")
+            return version
+        except (CacheUnavailable, RedisError) as e:
+            logger.error(f"Cache invalidation failed ({namespace}): {e}")
+            self._count(namespace, "errors")
+            return None
+
+    def stats(self) -> Dict:
+        return {"backend": type(self.backend).__name__, "namespaces": {ns: dict(c) for ns, c in self._stats.items()}}
+
+
+def create_cache_backend(kind: str) -> CacheBackend:
+    """Build the configured backend, falling back to the in-process LRU"""
+    try:
+        if kind == 'shm':
+            return SharedMemoryCacheBackend(CACHE_SHM_PATH, CACHE_SHM_SLOTS, CACHE_SHM_SLOT_BYTES)
+        if kind == 'redis':
+            return RedisCacheBackend(CACHE_REDIS_URL)
+    except (CacheUnavailable, OSError) as e:
+        logger.warning(f"Cache backend '{kind}' unavailable ({e}); using in-process LRU")
+    return LRUCacheBackend(CACHE_LRU_ITEMS)
+
+
+shared_cache = SharedCache(create_cache_backend(CACHE_BACKEND), CACHE_PREFIX)
+
 # -------------------------
 # Helper Functions
 # -------------------------
@@ -141,10 +939,17 @@ def get_user_by_phone(phone: str):
     return user
 
 def get_user_by_id(user_id: int):
-    """Get user by ID"""
+    """Get user by ID (cached, without the password hash)"""
+    user = shared_cache.get('users', user_id)
+    if user is not None:
+        return user
     conn = get_db_connection()
-    user = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+    row = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
     conn.close()
+    if row is None:
+        return None
+    user = {key: row[key] for key in row.keys() if key != 'password_hash'}
+    shared_cache.set('users', user_id, user)
     return user
 
 def save_chat_history(user_id: int, message: str, response: str, language: str = 'en'):
@@ -157,23 +962,96 @@ def save_chat_history(user_id: int, message: str, response: str, language: str =
     conn.commit()
     conn.close()
 
+# Malayalam inflections are suffixes (കുരുമുളക് -> കുരുമുളകിന്റെ), so Malayalam
+# terms are matched as prefixes of their stem with the trailing vowel sign/virama dropped.
+_FTS_TERM_RE = re.compile(r'[\w\u0d00-\u0d7f\u200c\u200d]+')
+_MALAYALAM_RE = re.compile(r'[\u0d00-\u0d7f]')
+_MALAYALAM_SIGNS = ''.join(chr(c) for c in range(0x0D3E, 0x0D4E)) + '\u0d57\u0d62\u0d63\u200c\u200d'
+
+def build_chat_search_query(text: str) -> str:
+    """Turn free text into a safe FTS5 query (all terms must match)"""
+    terms = []
+    for term in _FTS_TERM_RE.findall(text or ""):
+        if _MALAYALAM_RE.search(term):
+            stem = term.rstrip(_MALAYALAM_SIGNS)
+            if len(stem) >= 2:
+                terms.append(f'"{stem}"*')
+                continue
+        terms.append(f'"{term}"')
+    return " ".join(terms)
+
+def search_chat_history(user_id: Optional[int], query: str, page: int = 1, per_page: int = 20) -> Dict:
+    """Ranked, paginated search over a user's chat history (every user's if user_id is None)"""
+    offset = (page - 1) * per_page
+    conn = get_db_connection()
+    
+    if CHAT_FTS_ENABLED:
+        match = f'{{message response}}: ({build_chat_search_query(query)})'
+        if user_id is not None:
+            match = f'user_id:"{int(user_id)}" AND {match}'
+        rows = conn.execute(
+            '''SELECT h.id, h.user_id, h.message, h.response, h.timestamp, h.language,
+                      bm25(chat_history_fts, 2.0, 1.0, 0.0) AS rank,
+                      snippet(chat_history_fts, -1, '[', ']', '…', 12) AS snippet
+               FROM chat_history_fts JOIN chat_history h ON h.id = chat_history_fts.rowid
+               WHERE chat_history_fts MATCH ?
+               ORDER BY rank LIMIT ? OFFSET ?''',
+            (match, per_page + 1, offset)
+        ).fetchall()
+    else:
+        terms = _FTS_TERM_RE.findall(query or "")
+        sql = 'SELECT id, user_id, message, response, timestamp, language, NULL AS rank, NULL AS snippet FROM chat_history WHERE 1 = 1'
+        params: List[Any] = []
+        if user_id is not None:
+            sql += ' AND user_id = ?'
+            params.append(user_id)
+        for term in terms:
+            sql += ' AND (message LIKE ? OR response LIKE ?)'
+            params += [f'%{term}%', f'%{term}%']
+        rows = conn.execute(sql + ' ORDER BY timestamp DESC LIMIT ? OFFSET ?', params + [per_page + 1, offset]).fetchall()
+    conn.close()
+    
+    results = [dict(row) for row in rows[:per_page]]
+    for result in results:
+        # bm25() is lower-is-better; expose a higher-is-better score
+        rank = result.pop('rank')
+        result['score'] = round(-rank, 4) if rank is not None else None
+    return {
+        "query": query,
+        "page": page,
+        "per_page": per_page,
+        "has_more": len(rows) > per_page,
+        "results": results,
+    }
+
 def get_weather_data(location: str) -> Dict:
-    """Get real-time weather data for location (cached)"""
+    """Get real-time weather data for location (cached per weather grid cell)"""
+    cell = weather_grid.resolve(location)
+    cache_key = weather_cache_key(location)
+    weather_data = shared_cache.get('weather', cache_key)
+    if weather_data is not None:
+        weather_data["location"] = location
+        return weather_data
+    
     conn = get_db_connection()
     
     # Check cache first (valid for 30 minutes for real-time feel)
     cached = conn.execute(
-        'SELECT data FROM weather_cache WHERE location = ? AND timestamp > datetime("now", "-30 minutes")',
-        (location,)
+        'SELECT data FROM weather_cache WHERE location = ? AND timestamp > datetime("now", "-30 minutes") ORDER BY id DESC LIMIT 1',
+        (cache_key,)
     ).fetchone()
     
     if cached:
         conn.close()
-        return json.loads(cached['data'])
+        weather_data = json.loads(cached['data'])
+        shared_cache.set('weather', cache_key, weather_data)
+        weather_data["location"] = location
+        return weather_data
     
     # Fetch fresh data with enhanced farming insights
     weather_data = {
         "location": location,
+        "cell": cell,
         "temperature": 28,
         "humidity": 75,
         "rainfall": 15,
@@ -194,10 +1072,11 @@ def get_weather_data(location: str) -> Dict:
     # Cache the data
     conn.execute(
         'INSERT OR REPLACE INTO weather_cache (location, data) VALUES (?, ?)',
-        (location, json.dumps(weather_data))
+        (cache_key, json.dumps(weather_data))
     )
     conn.commit()
     conn.close()
+    shared_cache.set('weather', cache_key, weather_data)
     
     return weather_data
 
@@ -285,6 +1164,10 @@ def generate_weather_alerts(temperature: float, humidity: float, condition: str)
 
 def get_market_prices(district: str = None) -> List[Dict]:
     """Get market prices (cached)"""
+    prices = shared_cache.get('market', district or '*')
+    if prices is not None:
+        return prices
+    
     conn = get_db_connection()
     
     # Check cache first (valid for 6 hours)
@@ -296,10 +1179,17 @@ def get_market_prices(district: str = None) -> List[Dict]:
         params.append(district)
     
     cached_prices = conn.execute(query, params).fetchall()
+    if not cached_prices and district:
+        # No prices for this district: show the state-wide list rather than refreshing again
+        cached_prices = conn.execute(
+            'SELECT * FROM market_prices WHERE timestamp > datetime("now", "-6 hours")'
+        ).fetchall()
     
     if cached_prices:
         conn.close()
-        return [dict(row) for row in cached_prices]
+        prices = [dict(row) for row in cached_prices]
+        shared_cache.set('market', district or '*', prices)
+        return prices
     
     # Mock market data
     mock_prices = [
@@ -319,6 +1209,9 @@ def get_market_prices(district: str = None) -> List[Dict]:
     
     conn.commit()
     conn.close()
+    # New prices change every district's list and the all-districts list
+    shared_cache.invalidate('market')
+    shared_cache.set('market', district or '*', mock_prices)
     
     return mock_prices
 
@@ -359,6 +1252,730 @@ def calculate_irrigation_schedule(crop: str, soil_moisture: float, weather: Dict
     
     return schedule
 
+# -------------------------
+# LLM Admission Control
+# -------------------------
+class AdmissionRejected(Exception):
+    """Raised when an upstream LLM call is shed instead of admitted"""
+
+    def __init__(self, reason: str, retry_after: float = 1.0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = min(max(1.0, retry_after), 300.0)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter. Callers must hold the controller lock."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def consume(self, now: float) -> float:
+        """Take one token. Returns 0 on success, else seconds until one is available."""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        if self.rate <= 0:
+            return float('inf')
+        return (1 - self.tokens) / self.rate
+
+    def drain(self, now: float, seconds: float):
+        """Push the bucket into debt, e.g. after an upstream 429"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+
+
+class _Ticket:
+    __slots__ = ('key', 'user_id', 'deadline', 'enqueued', 'shed')
+
+    def __init__(self, key, user_id, deadline, enqueued):
+        self.key = key
+        self.user_id = user_id
+        self.deadline = deadline
+        self.enqueued = enqueued
+        self.shed = None
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class LLMAdmissionController:
+    """
+    Gatekeeper for upstream Gemini calls.
+
+    A request must pass its user's token bucket and fair-share cap, then waits
+    in a bounded priority queue until a concurrency slot and a global token are
+    free. Queue priority favours users with less outstanding work, then the
+    earliest deadline. Requests whose deadline passes (or cannot be met given
+    the observed service time) are shed rather than sent late.
+    """
+
+    def __init__(self, max_concurrency: int, global_rate: float, global_burst: int,
+                 user_rate: float, user_burst: int, user_max_pending: int,
+                 queue_max: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.user_max_pending = user_max_pending
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+
+        self._cond = threading.Condition()
+        self._global_bucket = TokenBucket(global_rate, global_burst)
+        self._user_buckets: Dict[Any, TokenBucket] = {}
+        self._user_pending: Dict[Any, int] = {}
+        self._queue: List[_Ticket] = []
+        self._seq = 0
+        self._active = 0
+        self._service_time = 0.0  # EWMA of upstream latency, seconds (0 until observed)
+
+        self._admitted = 0
+        self._shed: Dict[str, int] = {}
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # Internal helpers (lock held) ------------------------------------------
+    def _reject(self, reason: str, retry_after: float = 1.0):
+        self._shed[reason] = self._shed.get(reason, 0) + 1
+        raise AdmissionRejected(reason, retry_after)
+
+    def _remove(self, ticket: _Ticket):
+        self._queue.remove(ticket)
+        heapq.heapify(self._queue)
+        self._release_user(ticket.user_id)
+        # The queue head may have changed; waiters must re-check instead of sleeping to their deadline
+        self._cond.notify_all()
+
+    def _release_user(self, user_id):
+        pending = self._user_pending.get(user_id, 0) - 1
+        if pending > 0:
+            self._user_pending[user_id] = pending
+        else:
+            self._user_pending.pop(user_id, None)
+
+    def _estimated_wait(self, position: int) -> float:
+        return (position // max(1, self.max_concurrency)) * self._service_time
+
+    def _record_wait(self, waited: float):
+        self._wait_count += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    # Public API -------------------------------------------------------------
+    def acquire(self, user_id, timeout: Optional[float] = None) -> float:
+        """Block until the caller may hit the upstream API. Returns seconds waited."""
+        timeout = self.queue_timeout if timeout is None else timeout
+        with self._cond:
+            now = time.monotonic()
+
+            pending = self._user_pending.get(user_id, 0)
+            if pending >= self.user_max_pending:
+                self._reject('user_share', self._service_time)
+
+            self._seq += 1
+            ticket = _Ticket((pending, now + timeout, self._seq), user_id, now + timeout, now)
+
+            evict = None
+            if len(self._queue) >= self.queue_max:
+                evict = max(self._queue)
+                if not ticket < evict:
+                    self._reject('queue_full', self._service_time)
+
+            # Only requests that will actually be enqueued spend rate-limit budget
+            bucket = self._user_buckets.get(user_id)
+            if bucket is None:
+                bucket = self._user_buckets[user_id] = TokenBucket(self.user_rate, self.user_burst)
+            user_wait = bucket.consume(now)
+            if user_wait > 0:
+                self._reject('user_rate', user_wait)
+
+            if evict is not None:
+                evict.shed = 'queue_full'
+                self._remove(evict)
+
+            self._user_pending[user_id] = pending + 1
+            heapq.heappush(self._queue, ticket)
+
+            while True:
+                now = time.monotonic()
+                if ticket.shed:
+                    self._reject(ticket.shed, self._service_time)
+
+                remaining = ticket.deadline - now
+                if remaining <= 0:
+                    self._remove(ticket)
+                    self._reject('timeout', self._service_time)
+
+                position = sorted(self._queue).index(ticket)
+                if position >= self.max_concurrency and self._estimated_wait(position) > remaining:
+                    self._remove(ticket)
+                    self._reject('deadline', self._estimated_wait(position))
+
+                sleep_for = remaining
+                if self._queue[0] is ticket and self._active < self.max_concurrency:
+                    global_wait = self._global_bucket.consume(now)
+                    if global_wait == 0:
+                        heapq.heappop(self._queue)
+                        self._active += 1
+                        self._admitted += 1
+                        waited = now - ticket.enqueued
+                        self._record_wait(waited)
+                        # Let the next waiter re-check the head of the queue
+                        self._cond.notify_all()
+                        return waited
+                    sleep_for = min(remaining, global_wait)
+
+                self._cond.wait(sleep_for)
+
+    def release(self, user_id, service_time: Optional[float] = None):
+        """Return a concurrency slot taken by acquire()"""
+        with self._cond:
+            self._active -= 1
+            self._release_user(user_id)
+            if service_time is not None:
+                if self._service_time:
+                    self._service_time = 0.8 * self._service_time + 0.2 * service_time
+                else:
+                    self._service_time = service_time
+            self._cond.notify_all()
+
+    def throttle(self, seconds: float):
+        """Back off all callers, e.g. when the upstream answers 429"""
+        with self._cond:
+            self._global_bucket.drain(time.monotonic(), seconds)
+
+    @contextmanager
+    def slot(self, user_id, timeout: Optional[float] = None):
+        """Context manager wrapping acquire()/release()"""
+        self.acquire(user_id, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(user_id, time.monotonic() - started)
+
+    def stats(self) -> Dict:
+        """Snapshot of queue depth, wait times and shed counts"""
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "active": self._active,
+                "max_concurrency": self.max_concurrency,
+                "admitted": self._admitted,
+                "shed": dict(self._shed),
+                "shed_total": sum(self._shed.values()),
+                "wait_avg_ms": round(1000 * self._wait_total / self._wait_count, 2) if self._wait_count else 0.0,
+                "wait_max_ms": round(1000 * self._wait_max, 2),
+                "service_time_ms": round(1000 * self._service_time, 2),
+            }
+
+
+llm_admission = LLMAdmissionController(
+    LLM_MAX_CONCURRENCY, LLM_GLOBAL_RATE, LLM_GLOBAL_BURST,
+    LLM_USER_RATE, LLM_USER_BURST, LLM_USER_MAX_PENDING,
+    LLM_QUEUE_MAX, LLM_QUEUE_TIMEOUT,
+)
+
+# -------------------------
+# District Advisory Bulletins
+# -------------------------
+# Malayalam renderings of the fixed strings produced by generate_farming_advice,
+# generate_weather_alerts and the mock weather feed. Unknown strings fall back to English.
+ADVISORY_ML_TEXT = {
+    # Advice categories
+    "irrigation": "ജലസേചനം",
+    "planting": "നടീൽ",
+    "harvest": "വിളവെടുപ്പ്",
+    "pest_control": "കീടനിയന്ത്രണം",
+    "storage": "സംഭരണം",
+    # Conditions
+    "Partly Cloudy": "ഭാഗികമായി മേഘാവൃതം",
+    "Sunny": "വെയിൽ",
+    "Light Rain": "ചെറിയ മഴ",
+    # Advice
+    "Increase watering frequency due to high temperature": "ഉയർന്ന താപനില കാരണം നനയ്ക്കുന്നതിന്റെ ഇടവേള കുറയ്ക്കുക",
+    "Avoid planting during peak heat hours (10 AM - 4 PM)": "കടുത്ത ചൂടുള്ള സമയത്ത് (രാവിലെ 10 - വൈകുന്നേരം 4) നടീൽ ഒഴിവാക്കുക",
+    "Harvest early morning or late evening to avoid heat stress": "ചൂട് ഒഴിവാക്കാൻ അതിരാവിലെയോ വൈകുന്നേരമോ വിളവെടുക്കുക",
+    "Reduce watering, plants need less water in cool weather": "തണുത്ത കാലാവസ്ഥയിൽ ചെടികൾക്ക് കുറച്ച് വെള്ളം മതി, നന കുറയ്ക്കുക",
+    "Good time for cool-season crops like cabbage, cauliflower": "കാബേജ്, കോളിഫ്ലവർ പോലുള്ള ശീതകാല വിളകൾക്ക് അനുയോജ്യമായ സമയം",
+    "Normal harvesting time suitable": "സാധാരണ വിളവെടുപ്പ് സമയം അനുയോജ്യം",
+    "Normal watering schedule recommended": "സാധാരണ നനയ്ക്കൽ ക്രമം പാലിക്കുക",
+    "Ideal conditions for most crops": "മിക്ക വിളകൾക്കും അനുയോജ്യമായ സാഹചര്യം",
+    "Perfect weather for harvesting": "വിളവെടുപ്പിന് മികച്ച കാലാവസ്ഥ",
+    "High humidity - monitor for fungal diseases, ensure good ventilation": "ഉയർന്ന ഈർപ്പം - കുമിൾ രോഗങ്ങൾ ശ്രദ്ധിക്കുക, നല്ല വായുസഞ്ചാരം ഉറപ്പാക്കുക",
+    "Check for moisture before harvesting, dry properly": "വിളവെടുക്കുന്നതിന് മുമ്പ് ഈർപ്പം പരിശോധിക്കുക, നന്നായി ഉണക്കുക",
+    "Store crops in dry conditions to prevent mold": "പൂപ്പൽ തടയാൻ വിളകൾ ഈർപ്പമില്ലാത്ത സ്ഥലത്ത് സൂക്ഷിക്കുക",
+    "Low humidity - watch for spider mites, increase humidity if possible": "കുറഞ്ഞ ഈർപ്പം - ചിലന്തി മണ്ഡരി ശ്രദ്ധിക്കുക, സാധ്യമെങ്കിൽ ഈർപ്പം കൂട്ടുക",
+    "Increase watering due to low humidity": "ഈർപ്പം കുറവായതിനാൽ നന കൂട്ടുക",
+    "Water newly planted seeds more frequently": "പുതുതായി നട്ട വിത്തുകൾ കൂടുതൽ തവണ നനയ്ക്കുക",
+    "Normal pest monitoring recommended": "സാധാരണ കീട നിരീക്ഷണം തുടരുക",
+    "Standard irrigation schedule": "സാധാരണ ജലസേചന ക്രമം",
+    "No irrigation needed - natural rainfall sufficient": "ജലസേചനം ആവശ്യമില്ല - മഴ മതിയാകും",
+    "Avoid harvesting during rain, wait for dry conditions": "മഴയത്ത് വിളവെടുപ്പ് ഒഴിവാക്കുക, തെളിഞ്ഞ കാലാവസ്ഥയ്ക്കായി കാത്തിരിക്കുക",
+    "Good time for planting, soil will be moist": "നടീലിന് നല്ല സമയം, മണ്ണിൽ ഈർപ്പമുണ്ടാകും",
+    "Monitor soil moisture, sunny days increase evaporation": "മണ്ണിലെ ഈർപ്പം നിരീക്ഷിക്കുക, വെയിലുള്ള ദിവസങ്ങളിൽ ബാഷ്പീകരണം കൂടും",
+    "Perfect weather for harvesting and drying crops": "വിളവെടുപ്പിനും ഉണക്കലിനും മികച്ച കാലാവസ്ഥ",
+    "Good conditions for planting, ensure adequate watering": "നടീലിന് നല്ല സാഹചര്യം, ആവശ്യത്തിന് നനവ് ഉറപ്പാക്കുക",
+    # Alerts
+    "High temperature alert - Protect crops from heat stress": "ഉയർന്ന താപനില മുന്നറിയിപ്പ് - വിളകളെ ചൂടിൽ നിന്ന് സംരക്ഷിക്കുക",
+    "Cool weather - Good for cool-season crops": "തണുത്ത കാലാവസ്ഥ - ശീതകാല വിളകൾക്ക് അനുയോജ്യം",
+    "High humidity - Watch for fungal diseases": "ഉയർന്ന ഈർപ്പം - കുമിൾ രോഗങ്ങൾ ശ്രദ്ധിക്കുക",
+    "Low humidity - Increase irrigation frequency": "കുറഞ്ഞ ഈർപ്പം - ജലസേചനം കൂട്ടുക",
+    "Rain expected - No irrigation needed": "മഴ പ്രതീക്ഷിക്കുന്നു - ജലസേചനം ആവശ്യമില്ല",
+}
+
+# Latest bulletin per (normalize_place(district), language), served without touching the database
+_advisory_cache: Dict[tuple, Dict] = {}
+_advisory_lock = threading.Lock()
+_advisory_generate_lock = threading.RLock()  # one generation at a time per process
+_advisory_stats = {"runs": 0, "last_run": None}
+
+
+def _advisory_text(text: str, lang: str) -> str:
+    return ADVISORY_ML_TEXT.get(text, text) if lang == 'ml' else text
+
+
+def _sentence(text: str) -> str:
+    """End text with exactly one full stop"""
+    return text.rstrip(' .!?।') + '.'
+
+
+def build_district_advisory(district: str, lang: str, weather: Dict, prices: List[Dict]) -> Dict:
+    """Build one bulletin from weather and market data"""
+    advice = {
+        _advisory_text(topic, lang): _advisory_text(text, lang)
+        for topic, text in weather.get("farming_advice", {}).items()
+    }
+    alerts = [
+        {**alert, "message": _advisory_text(alert.get("message", ""), lang)}
+        for alert in weather.get("alerts", [])
+    ]
+    market = [
+        {"crop": p["crop_name"], "price": p["price_per_kg"], "unit": p["unit"], "market": p["market_name"]}
+        for p in prices if p.get("district") == district
+    ]
+    condition = _advisory_text(weather.get("condition", ""), lang)
+
+    if lang == 'ml':
+        lines = [f"{district} - കാലാവസ്ഥ: {condition}, {weather.get('temperature')}°C, ഈർപ്പം {weather.get('humidity')}%, മഴ {weather.get('rainfall')} mm."]
+        lines += [_sentence(f"{topic}: {text}") for topic, text in advice.items()]
+        lines += [f"{m['crop']} വില: ₹{m['price']}/{m['unit']} ({m['market']})." for m in market]
+    else:
+        lines = [f"{district} - Weather: {condition}, {weather.get('temperature')}°C, humidity {weather.get('humidity')}%, rainfall {weather.get('rainfall')} mm."]
+        lines += [_sentence(f"{topic.replace('_', ' ').capitalize()}: {text}") for topic, text in advice.items()]
+        lines += [f"{m['crop']} price: ₹{m['price']}/{m['unit']} ({m['market']})." for m in market]
+    lines += [_sentence(alert["message"]) for alert in alerts]
+
+    return {
+        "district": district,
+        "language": lang,
+        "weather": {
+            **{key: weather.get(key) for key in ("temperature", "humidity", "rainfall")},
+            "condition": condition,
+        },
+        "advice": advice,
+        "alerts": alerts,
+        "market": market,
+        "summary": " ".join(lines),
+    }
+
+
+def registered_district(name: str) -> Optional[str]:
+    """The district as stored in users.district that name refers to, if any user has it"""
+    target = normalize_place(name)
+    if not target:
+        return None
+    conn = get_db_connection()
+    rows = conn.execute(
+        "SELECT DISTINCT TRIM(district) AS district FROM users WHERE district IS NOT NULL AND TRIM(district) != ''"
+    ).fetchall()
+    conn.close()
+    for row in rows:
+        if normalize_place(row['district']) == target:
+            return row['district']
+    return None
+
+
+def generate_district_advisories(districts: Optional[List[str]] = None) -> Dict:
+    """Generate and store a new version of the bulletins for every district"""
+    with _advisory_generate_lock:
+        started = time.monotonic()
+        conn = get_db_connection()
+        if districts is None:
+            rows = conn.execute(
+                "SELECT DISTINCT TRIM(district) AS district FROM users WHERE district IS NOT NULL AND TRIM(district) != ''"
+            ).fetchall()
+            districts = [row['district'] for row in rows]
+        generated_at = datetime.now().isoformat(timespec='seconds')
+        generated_ts = time.time()
+
+        bulletins = []
+        for district in districts:
+            weather = get_weather_data(district)
+            prices = get_market_prices(district)
+            for lang in ADVISORY_LANGUAGES:
+                bulletins.append(build_district_advisory(district, lang, weather, prices))
+
+        # Allocate the version and insert atomically; other workers may be generating too
+        conn.isolation_level = None
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            version = conn.execute('SELECT COALESCE(MAX(version), 0) + 1 FROM advisory_bulletins').fetchone()[0]
+            for bulletin in bulletins:
+                bulletin.update(version=version, generated_at=generated_at)
+            conn.executemany(
+                'INSERT INTO advisory_bulletins (district, language, version, content) VALUES (?, ?, ?, ?)',
+                [(b["district"], b["language"], version, json.dumps(b, ensure_ascii=False)) for b in bulletins]
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        duration = time.monotonic() - started
+        with _advisory_lock:
+            for bulletin in bulletins:
+                _advisory_cache[(normalize_place(bulletin["district"]), bulletin["language"])] = (generated_ts, bulletin)
+            _advisory_stats["runs"] += 1
+            last_run = _advisory_stats["last_run"] = {
+                "version": version,
+                "generated_at": generated_at,
+                "districts": len(districts),
+                "bulletins": len(bulletins),
+                "duration_ms": round(1000 * duration, 2),
+                "bulletins_per_sec": round(len(bulletins) / duration, 1) if duration > 0 else None,
+            }
+
+    logger.info(f"Generated {len(bulletins)} advisory bulletins (v{version}) for {len(districts)} districts in {duration:.2f}s")
+    return last_run
+
+
+def _load_latest_advisory(district: str, lang: str) -> Optional[tuple]:
+    conn = get_db_connection()
+    row = conn.execute(
+        'SELECT content FROM advisory_bulletins WHERE district = ? AND language = ? ORDER BY version DESC LIMIT 1',
+        (district, lang)
+    ).fetchone()
+    conn.close()
+    if row is None:
+        return None
+    bulletin = json.loads(row['content'])
+    entry = (datetime.fromisoformat(bulletin['generated_at']).timestamp(), bulletin)
+    with _advisory_lock:
+        return _advisory_cache.setdefault((normalize_place(district), lang), entry)
+
+
+def get_district_advisory(district: str, lang: str = 'en', version: Optional[int] = None) -> Optional[Dict]:
+    """
+    Return the latest (or a specific version of a) district bulletin.
+
+    Only districts registered in users.district are served. A missing or
+    stale (older than ADVISORY_REFRESH_HOURS) bulletin is regenerated on
+    demand, so bulletins stay fresh even when the scheduler is not running.
+    """
+    district = (district or "").strip()
+    if not district:
+        return None
+    lang = lang if lang in ADVISORY_LANGUAGES else 'en'
+
+    if version is not None:
+        conn = get_db_connection()
+        row = conn.execute(
+            'SELECT content FROM advisory_bulletins WHERE district = ? COLLATE NOCASE AND language = ? AND version = ?',
+            (district, lang, version)
+        ).fetchone()
+        conn.close()
+        return json.loads(row['content']) if row else None
+
+    key = (normalize_place(district), lang)
+    with _advisory_lock:
+        cached = _advisory_cache.get(key)
+    canonical = None
+    if cached is None:
+        canonical = registered_district(district)
+        if canonical is None:
+            return None
+        cached = _load_latest_advisory(canonical, lang)
+
+    if cached is None or time.time() - cached[0] > ADVISORY_REFRESH_HOURS * 3600:
+        canonical = canonical or registered_district(district)
+        # With a stale copy in hand, don't queue behind a generation already in progress
+        if canonical and _advisory_generate_lock.acquire(blocking=cached is None):
+            try:
+                with _advisory_lock:
+                    current = _advisory_cache.get(key)
+                if current is None or time.time() - current[0] > ADVISORY_REFRESH_HOURS * 3600:
+                    generate_district_advisories([canonical])
+            finally:
+                _advisory_generate_lock.release()
+            with _advisory_lock:
+                cached = _advisory_cache.get(key, cached)
+
+    return cached[1] if cached else None
+
+
+def advisory_stats() -> Dict:
+    """Generation throughput and freshness of cached bulletins"""
+    now = time.time()
+    with _advisory_lock:
+        ages = [now - generated_ts for generated_ts, _ in _advisory_cache.values()]
+        return {
+            "runs": _advisory_stats["runs"],
+            "last_run": _advisory_stats["last_run"],
+            "cached_bulletins": len(ages),
+            "oldest_age_s": round(max(ages), 1) if ages else None,
+            "newest_age_s": round(min(ages), 1) if ages else None,
+            "refresh_hours": ADVISORY_REFRESH_HOURS,
+        }
+
+
+def _advisory_scheduler():
+    while True:
+        try:
+            generate_district_advisories()
+        except Exception as e:
+            logger.error(f"Advisory generation failed: {e}")
+        time.sleep(ADVISORY_REFRESH_HOURS * 3600)
+
+
+def start_advisory_scheduler():
+    """Regenerate bulletins in a background thread every ADVISORY_REFRESH_HOURS"""
+    thread = threading.Thread(target=_advisory_scheduler, name="advisory-scheduler", daemon=True)
+    thread.start()
+    return thread
+
+# -------------------------
+# Database Maintenance
+# -------------------------
+_maintenance_lock = threading.Lock()
+_maintenance_stats = {"runs": 0, "last_run": None, "last_analyze": None, "archive_bytes": None}
+_ARCHIVE_DAY_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def archive_partition_path(table: str, day: str) -> str:
+    """Compressed JSON Lines file holding one day of archived rows"""
+    if not _ARCHIVE_DAY_RE.match(day):
+        return os.path.join(ARCHIVE_DIR, table, 'undated.jsonl.gz')
+    return os.path.join(ARCHIVE_DIR, table, day[:4], day[5:7], f"{day}.jsonl.gz")
+
+
+def _archive_rows(table: str, column: str, rows: List[sqlite3.Row]):
+    by_day: Dict[str, List[Dict]] = {}
+    for row in rows:
+        by_day.setdefault(str(row[column] or '')[:10], []).append(dict(row))
+    for day, day_rows in by_day.items():
+        path = archive_partition_path(table, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Each chunk is appended as its own gzip member; readers see one stream
+        with open(path, 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='ab') as gz:
+                for row in day_rows:
+                    gz.write((json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8'))
+            raw.flush()
+            os.fsync(raw.fileno())
+
+
+def query_archive(table: str, start: str, end: str, filters: Optional[Dict] = None, limit: int = 1000) -> List[Dict]:
+    """Read archived rows for days start..end (YYYY-MM-DD, inclusive) matching filters"""
+    day = datetime.strptime(start, '%Y-%m-%d').date()
+    last = datetime.strptime(end, '%Y-%m-%d').date()
+    filters = filters or {}
+    results, seen = [], set()
+    while day <= last and len(results) < limit:
+        path = archive_partition_path(table, day.isoformat())
+        if os.path.exists(path):
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    # A chunk archived just before a crash may be archived again on the next run
+                    if row.get('id') in seen or any(row.get(k) != v for k, v in filters.items()):
+                        continue
+                    seen.add(row.get('id'))
+                    results.append(row)
+                    if len(results) >= limit:
+                        break
+        day += timedelta(days=1)
+    return results
+
+
+def refresh_archive_size() -> int:
+    """Walk ARCHIVE_DIR and remember its size for database_size()"""
+    archive_bytes = 0
+    for root, _, files in os.walk(ARCHIVE_DIR):
+        archive_bytes += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    _maintenance_stats["archive_bytes"] = archive_bytes
+    return archive_bytes
+
+
+def database_size(conn) -> Dict:
+    """Allocated and free bytes, plus archived bytes as of the last maintenance run"""
+    page_size = conn.execute('PRAGMA page_size').fetchone()[0]
+    page_count = conn.execute('PRAGMA page_count').fetchone()[0]
+    freelist = conn.execute('PRAGMA freelist_count').fetchone()[0]
+    return {
+        "db_bytes": page_size * page_count,
+        "free_bytes": page_size * freelist,
+        "archive_bytes": _maintenance_stats["archive_bytes"],
+    }
+
+
+def _expire_table(conn, table: str, policy: Dict) -> Dict:
+    """Archive and delete expired rows in small chunks, yielding between them"""
+    started = time.monotonic()
+    column = policy['column']
+    cutoff = f"-{int(policy['days'])} days"
+    archived = deleted = 0
+    for _ in range(MAINTENANCE_MAX_BATCHES):
+        rows = conn.execute(
+            f'SELECT * FROM {table} WHERE {column} < datetime("now", ?) ORDER BY id LIMIT ?',
+            (cutoff, MAINTENANCE_BATCH_ROWS)
+        ).fetchall()
+        if not rows:
+            break
+        if policy['archive']:
+            _archive_rows(table, column, rows)
+            archived += len(rows)
+        ids = [row['id'] for row in rows]
+        conn.execute(f'DELETE FROM {table} WHERE id IN ({",".join("?" * len(ids))})', ids)
+        conn.commit()
+        deleted += len(rows)
+        if len(rows) < MAINTENANCE_BATCH_ROWS:
+            break
+        time.sleep(MAINTENANCE_PAUSE_SECONDS)
+    return {"archived": archived, "deleted": deleted, "duration_ms": round(1000 * (time.monotonic() - started), 2)}
+
+
+def convert_to_incremental_vacuum(path: str = 'krishi_sakhi.db') -> None:
+    """Switch a database created before incremental mode over (rewrites the file; run with the server stopped)"""
+    conn = sqlite3.connect(path)
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        logger.info(f"{path} already uses incremental auto-vacuum")
+    else:
+        logger.info(f"Converting {path} to incremental auto-vacuum")
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+    conn.close()
+
+
+def _incremental_vacuum(conn) -> Dict:
+    """Return free pages to the filesystem a few hundred at a time"""
+    started = time.monotonic()
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+        # A full VACUUM would lock and rewrite the whole database, so leave it to an offline run
+        logger.warning("Database is not in incremental auto-vacuum mode; stop the server and run "
+                       "'python app.py --convert-incremental-vacuum' to reclaim space")
+        return {"incremental": False, "pages_freed": 0, "duration_ms": 0.0}
+
+    freed = 0
+    while True:
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        # execute() steps a row-less statement once, freeing a single page;
+        # executescript() runs it to completion
+        conn.executescript(f'PRAGMA incremental_vacuum({min(free, MAINTENANCE_VACUUM_PAGES)});')
+        remaining = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if remaining >= free:
+            break
+        freed += free - remaining
+        time.sleep(MAINTENANCE_PAUSE_SECONDS)
+    return {"incremental": True, "pages_freed": freed,
+            "duration_ms": round(1000 * (time.monotonic() - started), 2)}
+
+
+def run_maintenance(force_analyze: bool = False) -> Optional[Dict]:
+    """Apply retention, reclaim space and refresh planner statistics"""
+    if not _maintenance_lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.monotonic()
+        # Autocommit so vacuum/analyze never sit inside a long transaction
+        conn = get_db_connection()
+        conn.isolation_level = None
+        size_before = database_size(conn)
+
+        tables = {}
+        for table, policy in RETENTION_POLICIES.items():
+            if policy['days'] > 0:
+                tables[table] = _expire_table(conn, table, policy)
+                if tables[table]['deleted'] and policy.get('cache'):
+                    shared_cache.invalidate(policy['cache'])
+        vacuum = _incremental_vacuum(conn)
+        refresh_archive_size()
+
+        analyze_ms = None
+        last_analyze = _maintenance_stats["last_analyze"]
+        if force_analyze or last_analyze is None or time.time() - last_analyze >= ANALYZE_INTERVAL_HOURS * 3600:
+            analyze_started = time.monotonic()
+            conn.execute('PRAGMA analysis_limit = 1000')
+            conn.execute('ANALYZE')
+            analyze_ms = round(1000 * (time.monotonic() - analyze_started), 2)
+            _maintenance_stats["last_analyze"] = time.time()
+
+        size_after = database_size(conn)
+        conn.close()
+
+        last_run = {
+            "started_at": datetime.now().isoformat(timespec='seconds'),
+            "duration_ms": round(1000 * (time.monotonic() - started), 2),
+            "tables": tables,
+            "vacuum": vacuum,
+            "analyze_ms": analyze_ms,
+            "size_before": size_before,
+            "size_after": size_after,
+        }
+        _maintenance_stats["runs"] += 1
+        _maintenance_stats["last_run"] = last_run
+        logger.info(f"Maintenance: deleted {sum(t['deleted'] for t in tables.values())} rows, "
+                    f"db {size_before['db_bytes']} -> {size_after['db_bytes']} bytes in {last_run['duration_ms']}ms")
+        return last_run
+    finally:
+        _maintenance_lock.release()
+
+
+def maintenance_stats() -> Dict:
+    """Current database size and the last maintenance run"""
+    conn = get_db_connection()
+    size = database_size(conn)
+    conn.close()
+    return {
+        **size,
+        "runs": _maintenance_stats["runs"],
+        "last_run": _maintenance_stats["last_run"],
+        "retention_days": {table: policy['days'] for table, policy in RETENTION_POLICIES.items()},
+    }
+
+
+def _maintenance_scheduler():
+    try:
+        refresh_archive_size()
+    except OSError as e:
+        logger.error(f"Could not measure archive size: {e}")
+    while True:
+        time.sleep(MAINTENANCE_INTERVAL_MINUTES * 60)
+        try:
+            run_maintenance()
+        except Exception as e:
+            logger.error(f"Database maintenance failed: {e}")
+
+
+def start_maintenance_scheduler():
+    """Run retention and vacuum in a background thread every MAINTENANCE_INTERVAL_MINUTES"""
+    thread = threading.Thread(target=_maintenance_scheduler, name="db-maintenance", daemon=True)
+    thread.start()
+    return thread
+
 # -------------------------
 # Routes
 # -------------------------
@@ -387,6 +2004,7 @@ def login():
             conn.execute('UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = ?', (user['id'],))
             conn.commit()
             conn.close()
+            shared_cache.delete('users', user['id'])
             
             return redirect(url_for('dashboard'))
         else:
@@ -456,8 +2074,8 @@ def dashboard():
     ).fetchall()
     conn.close()
     
-    # Get weather data for user's district
-    weather = get_weather_data(user['district'])
+    # Get weather data for user's pincode (falls back to district if the pincode is unknown)
+    weather = get_weather_data(user['pincode'] if weather_grid.resolve(user['pincode']) else user['district'])
     
     # Get market prices for user's district
     market_prices = get_market_prices(user['district'])
@@ -527,6 +2145,16 @@ def api_chat():
     # Enhanced system prompt with user context
     user = get_user_by_id(session['user_id'])
     user_context = f"User: {user['name']}, District: {user['district']}, Pincode: {user['pincode']}"
+
+    # Prefill with the precomputed district bulletin so the model starts from local conditions
+    try:
+        advisory = get_district_advisory(user['district'], lang)
+    except Exception as e:
+        logger.error(f"Advisory lookup error: {e}")
+        advisory = None
+    if advisory:
+        # The prompt adds its own full stop after user_context
+        user_context += f". Current district advisory: {advisory['summary'].rstrip(' .!?।')}"
     
     if lang == "ml":
         system_text = (
@@ -560,10 +2188,24 @@ def api_chat():
     url = f"{API_BASE}/models/{model}:generateContent?key={api_key}"
 
     try:
-        resp = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=60)
+        with llm_admission.slot(session['user_id']):
+            resp = requests.post(url, json=payload, headers={"Content-Type": "application/json"}, timeout=60)
+    except AdmissionRejected as e:
+        logger.warning(f"LLM request shed ({e.reason}) for user {session['user_id']}")
+        retry_after = int(e.retry_after + 0.999)
+        return jsonify({"error": "Too many requests, please retry shortly", "reason": e.reason,
+                        "retry_after": retry_after}), 429, {"Retry-After": str(retry_after)}
     except requests.RequestException as e:
         return jsonify({"error": f"Network error: {e}"}), 502
 
+    if resp.status_code == 429:
+        # Upstream quota exhausted - slow everyone down instead of retrying into it
+        try:
+            backoff = float(resp.headers.get("Retry-After", 5))
+        except ValueError:
+            backoff = 5.0
+        llm_admission.throttle(backoff)
+
     if not resp.ok:
         return jsonify({"error": f"API error {resp.status_code}", "details": resp.text}), resp.status_code
 
@@ -580,7 +2222,6 @@ def api_chat():
         text = "".join(p.get("text", "") for p in parts)
         
         # Clean up formatting - remove asterisks and markdown
-        import re
         text = re.sub(r'\*+', '', text)  # Remove asterisks
         text = re.sub(r'#+\s*', '', text)  # Remove markdown headers
         text = re.sub(r'`+', '', text)  # Remove backticks
@@ -591,11 +2232,12 @@ def api_chat():
     # Save chat history
     save_chat_history(session['user_id'], user_message, text, lang)
 
-    # Enhanced response with farming insights
+    # Enhanced response with farming insights (upstream payload only on ?debug=raw)
     response_data = {
-        "reply": text or "No content returned.",
-        "raw": api_response
+        "reply": text or "No content returned."
     }
+    if request.args.get("debug") == "raw":
+        response_data["raw"] = api_response
     
     # Add farming insights based on message content
     if any(keyword in user_message.lower() for keyword in ['disease', 'pest', 'problem', 'sick', 'damage']):
@@ -682,12 +2324,19 @@ def api_transcribe():
 # New API Endpoints
 # -------------------------
 
+@app.route("/api/weather", defaults={"location": None})
 @app.route("/api/weather/<location>")
 def api_weather(location):
-    """Get weather data for location"""
+    """Get weather data for location (defaults to the user's pincode/district)"""
     if 'user_id' not in session:
         return jsonify({"error": "Authentication required"}), 401
     
+    if location is None:
+        user = get_user_by_id(session['user_id'])
+        if not user:
+            return jsonify({"error": "User not found"}), 404
+        location = user['pincode'] if weather_grid.resolve(user['pincode']) else user['district']
+    
     try:
         weather_data = get_weather_data(location)
         return jsonify(weather_data)
@@ -803,11 +2452,96 @@ def api_chat_history():
         logger.error(f"Chat history API error: {e}")
         return jsonify({"error": "Failed to fetch chat history"}), 500
 
+@app.route("/api/chat-history/search")
+def api_chat_history_search():
+    """Full-text search over user's chat history (all users' with scope=all, for extension officers)"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Authentication required"}), 401
+    
+    user_id = session['user_id']
+    if request.args.get('scope') == 'all':
+        user = get_user_by_id(user_id)
+        if not user or user['phone'] not in EXTENSION_OFFICER_PHONES:
+            return jsonify({"error": "Searching all users requires an extension officer account"}), 403
+        user_id = None
+    
+    query = request.args.get('q', '').strip()
+    if not build_chat_search_query(query):
+        return jsonify({"error": "'q' is required"}), 400
+    page = max(1, request.args.get('page', 1, type=int))
+    per_page = min(max(1, request.args.get('per_page', 20, type=int)), 100)
+    
+    try:
+        return jsonify(search_chat_history(user_id, query, page, per_page))
+    except Exception as e:
+        logger.error(f"Chat history search API error: {e}")
+        return jsonify({"error": "Failed to search chat history"}), 500
+
+@app.route("/api/chat-history/archive")
+def api_chat_history_archive():
+    """Get user's archived chat history for a date range (read-only)"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Authentication required"}), 401
+    
+    start = request.args.get('from', '')
+    end = request.args.get('to', start)
+    try:
+        if (datetime.strptime(end, '%Y-%m-%d') - datetime.strptime(start, '%Y-%m-%d')).days > 366:
+            return jsonify({"error": "Date range must be at most one year"}), 400
+    except ValueError:
+        return jsonify({"error": "'from' and 'to' must be YYYY-MM-DD dates"}), 400
+    
+    try:
+        return jsonify(query_archive('chat_history', start, end, {"user_id": session['user_id']}))
+    except Exception as e:
+        logger.error(f"Chat history archive API error: {e}")
+        return jsonify({"error": "Failed to read chat history archive"}), 500
+
+@app.route("/api/advisories/<district>")
+def api_advisories(district):
+    """Get the precomputed advisory bulletin for a district"""
+    if 'user_id' not in session:
+        return jsonify({"error": "Authentication required"}), 401
+    
+    lang = request.args.get('lang', 'en').lower()
+    version = request.args.get('version', type=int)
+    try:
+        bulletin = get_district_advisory(district, lang, version)
+        if bulletin is None:
+            return jsonify({"error": "Advisory not found"}), 404
+        return jsonify(bulletin)
+    except Exception as e:
+        logger.error(f"Advisory API error: {e}")
+        return jsonify({"error": "Failed to fetch advisory"}), 500
+
+@app.route("/api/metrics")
+def api_metrics():
+    """Operational metrics for monitoring (logged-in users or METRICS_TOKEN bearer)"""
+    auth = request.headers.get('Authorization', '')
+    token = auth[len('Bearer '):] if auth.startswith('Bearer ') else ''
+    if 'user_id' not in session and not (
+            METRICS_TOKEN and token and secrets.compare_digest(token.encode(), METRICS_TOKEN.encode())):
+        return jsonify({"error": "Authentication required"}), 401
+    
+    return jsonify({
+        "llm_admission": llm_admission.stats(),
+        "advisories": advisory_stats(),
+        "database": maintenance_stats(),
+        "cache": shared_cache.stats(),
+    })
+
 
 # -------------------------
 # Run App
 # -------------------------
 if __name__ == "__main__":
+    if '--convert-incremental-vacuum' in sys.argv:
+        convert_to_incremental_vacuum()
+        sys.exit(0)
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'True').lower() == 'true'  # Default to True for development
+    # With the reloader only the child process (WERKZEUG_RUN_MAIN) serves requests
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_advisory_scheduler()
+        start_maintenance_scheduler()
     app.run(host="0.0.0.0", port=port, debug=debug, use_reloader=True)
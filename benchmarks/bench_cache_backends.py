@@ -0,0 +1,206 @@
+"""
+Benchmark cache hit latency across SharedCache backends.
+
+Times SharedCache.get() hits for representative payloads (weather forecast,
+market prices, user row) on the in-process LRU, shared-memory and
+Redis-protocol backends, checks that a second process sees shared-memory
+entries, and measures how long an invalidation broadcast takes to reach
+another client.
+
+Without --redis-url the Redis backend talks to StandInRedis, a small
+in-process server that speaks the subset of RESP the backend uses.
+
+    python benchmarks/bench_cache_backends.py --gets 20000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StandInRedis(socketserver.ThreadingTCPServer):
+    """GET/SET/DEL/INCR/PUBLISH/SUBSCRIBE over RESP2, enough for RedisCacheBackend"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 0)):
+        super().__init__(address, _StandInHandler)
+        self.data = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.server_address[0]}:{self.server_address[1]}/0"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _StandInHandler(socketserver.StreamRequestHandler):
+    def _reply(self, value):
+        if value is None:
+            self.wfile.write(b'$-1\r\n')
+        elif isinstance(value, int):
+            self.wfile.write(b':%d\r\n' % value)
+        elif isinstance(value, str):
+            self.wfile.write(b'+%s\r\n' % value.encode())
+        elif isinstance(value, list):
+            self.wfile.write(b'*%d\r\n' % len(value))
+            for item in value:
+                self._reply(item)
+        else:
+            self.wfile.write(b'$%d\r\n%s\r\n' % (len(value), value))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        server = self.server
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            cmd = args[0].upper()
+            with server.lock:
+                if cmd == b'GET':
+                    value, expires = server.data.get(args[1], (None, None))
+                    if expires is not None and expires < time.time():
+                        server.data.pop(args[1], None)
+                        value = None
+                    reply = value
+                elif cmd == b'SET':
+                    expires = None
+                    if len(args) > 4 and args[3].upper() == b'PX':
+                        expires = time.time() + int(args[4]) / 1000
+                    elif len(args) > 4 and args[3].upper() == b'EX':
+                        expires = time.time() + int(args[4])
+                    server.data[args[1]] = (args[2], expires)
+                    reply = 'OK'
+                elif cmd == b'DEL':
+                    reply = sum(server.data.pop(key, None) is not None for key in args[1:])
+                elif cmd == b'INCR':
+                    value = int(server.data.get(args[1], (b'0', None))[0]) + 1
+                    server.data[args[1]] = (str(value).encode(), None)
+                    reply = value
+                elif cmd == b'PUBLISH':
+                    listeners = list(server.subscribers.get(args[1], []))
+                    reply = len(listeners)
+                elif cmd == b'SUBSCRIBE':
+                    server.subscribers.setdefault(args[1], []).append(self)
+                    reply = [b'subscribe', args[1], 1]
+                else:
+                    reply = 'OK'  # PING, SELECT, AUTH
+            if cmd == b'PUBLISH':
+                for listener in listeners:
+                    try:
+                        listener._reply([b'message', args[1], args[2]])
+                        listener.wfile.flush()
+                    except OSError:
+                        pass
+            self._reply(reply)
+            self.wfile.flush()
+
+
+def percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def _child_read(path, slots, slot_bytes, queue):
+    sys.path.insert(0, ROOT)
+    import app
+    cache = app.SharedCache(app.SharedMemoryCacheBackend(path, slots, slot_bytes))
+    queue.put(cache.get('bench', 'cross-process'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--gets", type=int, default=20_000, help="timed hits per backend and payload")
+    parser.add_argument("--redis-url", help="benchmark a real Redis instead of the stand-in")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ks-bench-")
+    os.chdir(workdir)  # app.init_db() creates krishi_sakhi.db in the cwd
+    sys.path.insert(0, ROOT)
+    import app
+
+    payloads = {
+        "weather": app.get_weather_data("Thrissur"),
+        "market": app.get_market_prices(),
+        "user": {"id": 42, "phone": "9847000000", "name": "Kerala Farmer", "email": None,
+                 "aadhaar": "123456789012", "pincode": "680001", "district": "Thrissur",
+                 "created_at": "2025-06-01 10:00:00", "last_login": "2026-10-01 08:00:00"},
+    }
+    print(f"serializer: msgpack (+zlib >= {app.CACHE_COMPRESS_MIN_BYTES} bytes)")
+    for name, value in payloads.items():
+        print(f"  {name:<8} json {len(json.dumps(value).encode()):>6} B   cache {len(app.cache_dumps(value)):>6} B")
+
+    standin = None
+    redis_url = args.redis_url
+    if not redis_url:
+        standin = StandInRedis().start()
+        redis_url = standin.url
+    shm_path = os.path.join(workdir, "cache.shm")
+    backends = {
+        "lru": app.LRUCacheBackend(10_000),
+        "shm": app.SharedMemoryCacheBackend(shm_path, 1024, 4096),
+        "redis" + ("" if args.redis_url else " (stand-in)"): app.RedisCacheBackend(redis_url),
+    }
+
+    print(f"\n{'backend':<20}{'payload':<10}{'p50 us':>10}{'p99 us':>10}")
+    for backend_name, backend in backends.items():
+        cache = app.SharedCache(backend, prefix="bench")
+        for name, value in payloads.items():
+            cache.set("bench", name, value, ttl=600)
+            assert cache.get("bench", name) == value
+            samples = []
+            for _ in range(args.gets):
+                t0 = time.perf_counter()
+                cache.get("bench", name)
+                samples.append(time.perf_counter() - t0)
+            print(f"{backend_name:<20}{name:<10}{percentile(samples, 0.5) * 1e6:>10.1f}{percentile(samples, 0.99) * 1e6:>10.1f}")
+
+    # Another process attached to the same segment sees the entry
+    app.SharedCache(backends["shm"]).set('bench', 'cross-process', {"ok": True}, ttl=60)
+    queue = multiprocessing.get_context("spawn").Queue()
+    child = multiprocessing.get_context("spawn").Process(target=_child_read, args=(shm_path, 1024, 4096, queue))
+    child.start()
+    print(f"\nshm entry visible from second process: {queue.get(timeout=30) == {'ok': True}}")
+    child.join()
+
+    # Invalidation broadcast: one client bumps the version, another must stop serving old keys
+    writer = app.SharedCache(app.RedisCacheBackend(redis_url), prefix="bcast")
+    reader = app.SharedCache(app.RedisCacheBackend(redis_url), prefix="bcast")
+    time.sleep(0.2)  # let both subscribers connect
+    writer.set("weather", "cell", {"v": 1})
+    assert reader.get("weather", "cell") == {"v": 1}
+    t0 = time.perf_counter()
+    writer.invalidate("weather")
+    while reader.get("weather", "cell") is not None:
+        if time.perf_counter() - t0 > 5:
+            break
+    print(f"invalidation visible to other client after {(time.perf_counter() - t0) * 1e3:.2f} ms")
+
+    if standin:
+        standin.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Benchmark chat history search: FTS5 index vs. LIKE scan.
+
+Builds a throwaway database with synthetic English/Malayalam chat rows
+(Zipf-distributed filler vocabulary plus farming terms; insert throughput
+includes the FTS sync trigger), then times search_chat_history() for a
+single farmer and across all users (the extension officer search) against
+the equivalent LIKE queries.
+
+A farmer's own rows are few and reachable through the user_id index, so
+LIKE is already sub-millisecond there and FTS buys ranking, snippets and
+Malayalam stemming rather than speed. Across all users LIKE has to scan the
+whole table and the index is what keeps the search interactive.
+
+    python benchmarks/bench_chat_history_search.py --rows 2000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EN_WORDS = ("pepper wilt rice paddy coconut banana rubber irrigation fertilizer yellow leaves "
+            "fungal spray neem monsoon harvest soil drainage pest root rot mites price market "
+            "seedling nursery compost urea potash lime weeding mulch").split()
+ML_WORDS = ("കുരുമുളകിന്റെ വാട്ടം നെല്ല് തെങ്ങിന് വാഴയുടെ റബ്ബർ ജലസേചനം വളം ഇലകൾ മഞ്ഞളിപ്പ് "
+            "കീടം മഴ വിളവെടുപ്പ് മണ്ണ് വേര് ചീയൽ വില വിപണി ചാണകം കുമ്മായം").split()
+
+QUERIES = ["pepper wilt", "yellow leaves banana", "root rot", "coconut price market",
+           "കുരുമുളക് വാട്ടം", "വാഴ ഇലകൾ", "നെല്ല് വളം", "compost"]
+
+
+def synthetic_vocabulary(rng: random.Random, syllables, size: int):
+    words = sorted({"".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(size)})
+    rng.shuffle(words)
+    return words
+
+
+def zipf_weights(n: int):
+    total, weights = 0.0, []
+    for rank in range(1, n + 1):
+        total += 1 / rank
+        weights.append(total)
+    return weights
+
+
+def sentence(rng: random.Random, topic_words, filler, filler_weights, n: int) -> str:
+    words = rng.choices(filler, cum_weights=filler_weights, k=n)
+    for i in rng.sample(range(n), max(1, n // 8)):
+        words[i] = rng.choice(topic_words)
+    return " ".join(words)
+
+
+def percentile(samples, pct: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=5_000)
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per query")
+    parser.add_argument("--batch", type=int, default=50_000)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="ks-bench-")
+    os.chdir(workdir)  # app.init_db() creates krishi_sakhi.db in the cwd
+    sys.path.insert(0, ROOT)
+    import app
+
+    print(f"database: {os.path.join(workdir, 'krishi_sakhi.db')} (FTS5: {app.CHAT_FTS_ENABLED})")
+    rng = random.Random(42)
+    en_filler = synthetic_vocabulary(rng, ["ka", "lo", "mi", "ter", "an", "ing", "ro", "su", "pe", "dis"], 20_000)
+    ml_filler = synthetic_vocabulary(rng, ["ക", "ലാ", "മി", "ത്ത", "ന്", "രു", "വി", "പ്പ", "ടെ", "ങ്ങ"], 20_000)
+    en_weights, ml_weights = zipf_weights(len(en_filler)), zipf_weights(len(ml_filler))
+    conn = app.get_db_connection()
+    started = time.perf_counter()
+    for start in range(0, args.rows, args.batch):
+        batch = []
+        for _ in range(min(args.batch, args.rows - start)):
+            if rng.random() < 0.4:
+                vocab, lang = (ML_WORDS, ml_filler, ml_weights), 'ml'
+            else:
+                vocab, lang = (EN_WORDS, en_filler, en_weights), 'en'
+            batch.append((rng.randrange(1, args.users + 1), sentence(rng, *vocab, 8),
+                          sentence(rng, *vocab, 40), lang))
+        conn.executemany(
+            'INSERT INTO chat_history (user_id, message, response, language) VALUES (?, ?, ?, ?)', batch)
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    print(f"inserted {args.rows:,} rows in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s incl. FTS trigger)")
+    print(f"database size: {os.path.getsize('krishi_sakhi.db') / 1e6:.1f} MB")
+
+    print(f"\n{'one user':<24}{'fts p50':>10}{'fts p95':>10}{'like p50':>10}{'hits':>6}")
+    for query in QUERIES:
+        user_id = rng.randrange(1, args.users + 1)
+        fts_times, like_times = [], []
+        hits = 0
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            hits = len(app.search_chat_history(user_id, query)['results'])
+            fts_times.append(time.perf_counter() - t0)
+
+        terms = query.split()
+        sql = 'SELECT id FROM chat_history WHERE user_id = ?' + \
+              ' AND (message LIKE ? OR response LIKE ?)' * len(terms) + ' LIMIT 21'
+        params = [user_id] + [p for term in terms for p in (f'%{term}%', f'%{term}%')]
+        for _ in range(max(1, args.repeat // 4)):
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            like_times.append(time.perf_counter() - t0)
+
+        print(f"{query:<24}{percentile(fts_times, 0.5) * 1e3:>8.2f}ms{percentile(fts_times, 0.95) * 1e3:>8.2f}ms"
+              f"{statistics.median(like_times) * 1e3:>8.2f}ms{hits:>6}")
+
+    # Extension officers search every farmer's history; LIKE has no index to lean on
+    print(f"\n{'all users':<24}{'fts top-20':>12}{'like scan':>12}")
+    for query in ("pepper wilt", "കുരുമുളക് വാട്ടം", "compost"):
+        t0 = time.perf_counter()
+        app.search_chat_history(None, query)
+        fts_ms = (time.perf_counter() - t0) * 1e3
+        terms = query.split()
+        t0 = time.perf_counter()
+        conn.execute('SELECT id FROM chat_history WHERE ' +
+                     ' AND '.join(['(message LIKE ? OR response LIKE ?)'] * len(terms)),
+                     [p for term in terms for p in (f'%{term}%', f'%{term}%')]).fetchall()
+        like_ms = (time.perf_counter() - t0) * 1e3
+        print(f"{query:<24}{fts_ms:>10.1f}ms{like_ms:>10.1f}ms")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark JSON response encoding for /api/chat, /api/farm-data and /api/chat-history.
+
+Compares Flask's default provider (what jsonify used before) with
+FastJSONProvider, reporting bytes on the wire (plain and gzip at
+API_GZIP_LEVEL) and time to build the response body. The chat payload is
+measured both with the upstream "raw" echo (?debug=raw) and in lean mode.
+
+    python benchmarks/bench_json_responses.py --repeat 2000
+"""
+import argparse
+import gzip
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPLY_ML = ("നമസ്കാരം! കുരുമുളകിന്റെ ദ്രുതവാട്ടം ഫൈറ്റോഫ്തോറ എന്ന കുമിൾ മൂലമാണ്. "
+            "ചുവട്ടിൽ വെള്ളം കെട്ടിനിൽക്കാതെ നീർവാർച്ച ഉറപ്പാക്കുക. ട്രൈക്കോഡെർമ ചേർത്ത ചാണകം ഇടുക. "
+            "രോഗം ബാധിച്ച വള്ളികൾ നീക്കം ചെയ്ത് കത്തിക്കുക. ബോർഡോ മിശ്രിതം 1% തളിക്കുക. ") * 3
+
+
+def chat_response(with_raw: bool) -> dict:
+    data = {
+        "reply": REPLY_ML,
+        "insights": {
+            "type": "disease_help",
+            "suggestion": "Upload an image of the affected plant for better diagnosis",
+            "quick_actions": ["Check common diseases for your crop", "Get treatment recommendations", "Prevention tips"],
+        },
+    }
+    if with_raw:
+        data["raw"] = {
+            "candidates": [{
+                "content": {"parts": [{"text": "**" + REPLY_ML + "**"}], "role": "model"},
+                "finishReason": "STOP",
+                "safetyRatings": [
+                    {"category": category, "probability": "NEGLIGIBLE"}
+                    for category in ("HARM_CATEGORY_HATE_SPEECH", "HARM_CATEGORY_DANGEROUS_CONTENT",
+                                     "HARM_CATEGORY_HARASSMENT", "HARM_CATEGORY_SEXUALLY_EXPLICIT")
+                ],
+                "avgLogprobs": -0.2931,
+            }],
+            "usageMetadata": {"promptTokenCount": 412, "candidatesTokenCount": 389, "totalTokenCount": 801},
+            "modelVersion": "gemini-2.0-flash",
+        }
+    return data
+
+
+def farm_data_response() -> list:
+    crops = ["Rice", "Coconut", "Pepper", "Banana", "Rubber"]
+    return [{
+        "id": i, "user_id": 42, "crop_type": crops[i % 5], "planting_date": "2026-06-01",
+        "harvest_date": "2026-10-15", "area_acres": 1.5 + i / 10, "yield_kg": 1200.0 + i,
+        "cost_invested": 25000.0, "revenue": 41000.0 + i * 10, "notes": "Second crop after monsoon",
+        "created_at": "2026-06-01 09:30:00",
+    } for i in range(50)]
+
+
+def chat_history_response() -> list:
+    return [{
+        "id": i, "user_id": 42, "message": "കുരുമുളകിന്റെ ഇലകൾ മഞ്ഞളിക്കുന്നു, എന്ത് ചെയ്യണം?",
+        "response": REPLY_ML[:600], "timestamp": "2026-10-01 08:00:00", "language": "ml",
+    } for i in range(50)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.chdir(tempfile.mkdtemp(prefix="ks-bench-"))  # app.init_db() creates krishi_sakhi.db in the cwd
+    sys.path.insert(0, ROOT)
+    import app
+    from flask.json.provider import DefaultJSONProvider
+
+    payloads = {
+        "chat (raw)": chat_response(True),
+        "chat (lean)": chat_response(False),
+        "farm-data": farm_data_response(),
+        "chat-history": chat_history_response(),
+    }
+    providers = {
+        "flask default": DefaultJSONProvider(app.app),
+        "fast" + (" (orjson)" if app.orjson else " (stdlib)"): app.FastJSONProvider(app.app),
+    }
+
+    print(f"{'payload':<14}{'provider':<18}{'bytes':>8}{'gzip':>8}{'encode us':>11}")
+    with app.app.app_context():
+        for name, payload in payloads.items():
+            for provider_name, provider in providers.items():
+                body = provider.response(payload).get_data()
+                samples = []
+                for _ in range(args.repeat):
+                    t0 = time.perf_counter()
+                    provider.response(payload).get_data()
+                    samples.append(time.perf_counter() - t0)
+                print(f"{name:<14}{provider_name:<18}{len(body):>8}"
+                      f"{len(gzip.compress(body, app.API_GZIP_LEVEL)):>8}{statistics.median(samples) * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """Import app.py with its database and archive created in a scratch directory"""
+    workdir = tmp_path_factory.mktemp("app")
+    os.chdir(workdir)  # init_db() and ARCHIVE_DIR are relative to the cwd
+    sys.path.insert(0, ROOT)
+    import app
+    app.app.testing = True
+    return app
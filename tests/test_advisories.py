@@ -0,0 +1,74 @@
+import threading
+
+
+def _add_user(app_module, phone, district):
+    conn = app_module.get_db_connection()
+    conn.execute(
+        'INSERT OR IGNORE INTO users (phone, name, district, password_hash) VALUES (?, ?, ?, ?)',
+        (phone, 'Test Farmer', district, 'x')
+    )
+    conn.commit()
+    conn.close()
+
+
+def _bulletin_count(app_module):
+    conn = app_module.get_db_connection()
+    count = conn.execute('SELECT COUNT(*) FROM advisory_bulletins').fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_unknown_district_is_not_generated(app_module):
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    before = _bulletin_count(app_module)
+    assert client.get('/api/advisories/Nowhere123').status_code == 404
+    assert _bulletin_count(app_module) == before
+
+
+def test_registered_district_matches_normalized_name(app_module):
+    _add_user(app_module, '9000000001', 'Thrissur')
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    response = client.get('/api/advisories/thrissur district')
+    assert response.status_code == 200
+    assert response.get_json()['district'] == 'Thrissur'
+
+
+def test_stale_bulletin_is_regenerated(app_module, monkeypatch):
+    _add_user(app_module, '9000000002', 'Palakkad')
+    first = app_module.get_district_advisory('Palakkad')
+    assert app_module.get_district_advisory('Palakkad')['version'] == first['version']
+
+    key = (app_module.normalize_place('Palakkad'), 'en')
+    generated_ts, bulletin = app_module._advisory_cache[key]
+    app_module._advisory_cache[key] = (generated_ts - app_module.ADVISORY_REFRESH_HOURS * 3600 - 1, bulletin)
+    assert app_module.get_district_advisory('Palakkad')['version'] > first['version']
+
+
+def test_concurrent_generation_allocates_distinct_versions(app_module):
+    _add_user(app_module, '9000000003', 'Kannur')
+    versions = []
+    threads = [
+        threading.Thread(target=lambda: versions.append(app_module.generate_district_advisories(['Kannur'])['version']))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(versions)) == 4
+
+
+def test_bulletin_sentences_end_with_one_full_stop(app_module):
+    weather = {
+        "temperature": 28, "humidity": 75, "rainfall": 15, "condition": "Partly Cloudy",
+        "farming_advice": {"pest_control": "Normal pest monitoring recommended."},
+        "alerts": [{"type": "info", "message": "High humidity - Watch for fungal diseases"}],
+    }
+    bulletin = app_module.build_district_advisory("Thrissur", "ml", weather, [])
+    assert ".." not in bulletin["summary"]
+    assert bulletin["summary"].endswith(".")
+    assert bulletin["weather"]["condition"] == app_module.ADVISORY_ML_TEXT["Partly Cloudy"]
@@ -0,0 +1,36 @@
+import pytest
+
+
+@pytest.fixture
+def search_rows(app_module):
+    conn = app_module.get_db_connection()
+    conn.execute("INSERT OR IGNORE INTO users (id, phone, name, district, password_hash) VALUES (101, '9100000001', 'Farmer', 'Idukki', 'x')")
+    conn.execute("INSERT OR IGNORE INTO users (id, phone, name, district, password_hash) VALUES (102, '9100000002', 'Officer', 'Idukki', 'x')")
+    conn.execute("DELETE FROM chat_history WHERE user_id IN (101, 102)")
+    conn.execute("INSERT INTO chat_history (user_id, message, response) VALUES (101, 'pepper wilt on my vines', 'Improve drainage')")
+    conn.execute("INSERT INTO chat_history (user_id, message, response) VALUES (102, 'pepper wilt again', 'Apply Trichoderma')")
+    conn.commit()
+    conn.close()
+
+
+@pytest.mark.parametrize("fts", [True, False])
+def test_results_have_the_same_shape_with_and_without_fts(app_module, search_rows, monkeypatch, fts):
+    monkeypatch.setattr(app_module, 'CHAT_FTS_ENABLED', fts and app_module.CHAT_FTS_ENABLED)
+    results = app_module.search_chat_history(101, 'pepper wilt')['results']
+    assert len(results) == 1
+    assert 'rank' not in results[0]
+    assert set(results[0]) == {'id', 'user_id', 'message', 'response', 'timestamp', 'language', 'snippet', 'score'}
+
+
+def test_all_users_scope_is_limited_to_extension_officers(app_module, search_rows, monkeypatch):
+    monkeypatch.setattr(app_module, 'EXTENSION_OFFICER_PHONES', {'9100000002'})
+    client = app_module.app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = 101
+    assert len(client.get('/api/chat-history/search?q=pepper').get_json()['results']) == 1
+    assert client.get('/api/chat-history/search?q=pepper&scope=all').status_code == 403
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 102
+    response = client.get('/api/chat-history/search?q=pepper+wilt&scope=all')
+    assert {r['user_id'] for r in response.get_json()['results']} == {101, 102}
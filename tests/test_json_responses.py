@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.mark.parametrize("accept, compressed", [
+    ("gzip", True),
+    ("br, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("identity", False),
+    ("x-gzip-lite", False),
+])
+def test_gzip_follows_accept_encoding_quality(app_module, accept, compressed):
+    app = app_module.app
+    with app.test_request_context('/api/market-prices', headers={'Accept-Encoding': accept}):
+        response = app_module.jsonify({"rows": [{"crop": "Pepper", "price": i} for i in range(200)]})
+        response = app_module.compress_api_response(response)
+    assert (response.headers.get('Content-Encoding') == 'gzip') is compressed
+    assert 'Accept-Encoding' in response.headers['Vary']
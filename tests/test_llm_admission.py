@@ -0,0 +1,63 @@
+import threading
+import time
+
+import pytest
+
+
+def test_waiter_is_admitted_when_queue_head_times_out(app_module):
+    # One slot, global bucket drained so the next token arrives in ~1s
+    controller = app_module.LLMAdmissionController(1, 1.0, 1, 100.0, 100, 5, 10, 5.0)
+    with controller.slot("warmup"):
+        pass
+
+    results = {}
+
+    def request(user, timeout):
+        started = time.monotonic()
+        try:
+            controller.acquire(user, timeout)
+            results[user] = ("ok", time.monotonic() - started)
+            controller.release(user)
+        except app_module.AdmissionRejected as e:
+            results[user] = (e.reason, time.monotonic() - started)
+
+    head = threading.Thread(target=request, args=("a", 0.3))
+    head.start()
+    time.sleep(0.05)
+    behind = threading.Thread(target=request, args=("b", 5.0))
+    behind.start()
+    head.join()
+    behind.join()
+
+    assert results["a"][0] == "timeout"
+    assert results["b"][0] == "ok"
+    assert results["b"][1] < 2.0
+
+
+def test_rejected_request_does_not_spend_user_tokens(app_module):
+    # Two tokens per user that effectively never refill, one request in flight at a time
+    controller = app_module.LLMAdmissionController(4, 100.0, 100, 1e-6, 2, 1, 10, 1.0)
+    controller.acquire("u")
+    with pytest.raises(app_module.AdmissionRejected) as rejected:
+        controller.acquire("u")
+    assert rejected.value.reason == "user_share"
+    controller.release("u")
+
+    controller.acquire("u")
+    controller.release("u")
+    assert controller.stats()["shed"] == {"user_share": 1}
+
+
+def test_metrics_require_authentication(app_module, monkeypatch):
+    client = app_module.app.test_client()
+    assert client.get('/api/metrics').status_code == 401
+
+    monkeypatch.setattr(app_module, 'METRICS_TOKEN', 'scrape-me')
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Basic xscrape-me'}).status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-mé'.encode('utf-8')}).status_code == 401
+    assert client.get('/api/metrics', headers={'Authorization': 'Bearer scrape-me'}).status_code == 200
+
+    with client.session_transaction() as sess:
+        sess['user_id'] = 1
+    assert client.get('/api/metrics').status_code == 200
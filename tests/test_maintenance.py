@@ -0,0 +1,36 @@
+import sqlite3
+
+
+def _legacy_database(path):
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE t (x TEXT)')
+    conn.executemany('INSERT INTO t VALUES (?)', [('x' * 500,)] * 200)
+    conn.commit()
+    conn.execute('DELETE FROM t')
+    conn.commit()
+    return conn
+
+
+def test_live_maintenance_never_runs_a_full_vacuum(app_module, tmp_path):
+    conn = _legacy_database(tmp_path / 'legacy.db')
+    pages = conn.execute('PRAGMA page_count').fetchone()[0]
+    result = app_module._incremental_vacuum(conn)
+    assert result['incremental'] is False
+    assert conn.execute('PRAGMA page_count').fetchone()[0] == pages
+    conn.close()
+
+
+def test_offline_conversion_enables_incremental_vacuum(app_module, tmp_path):
+    path = str(tmp_path / 'legacy.db')
+    _legacy_database(path).close()
+    app_module.convert_to_incremental_vacuum(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    conn.close()
+
+
+def test_metrics_do_not_walk_the_archive(app_module, monkeypatch):
+    app_module.refresh_archive_size()
+    monkeypatch.setattr(app_module.os, 'walk', lambda *args: (_ for _ in ()).throw(AssertionError("walked archive")))
+    stats = app_module.maintenance_stats()
+    assert stats['archive_bytes'] is not None
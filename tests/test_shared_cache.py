@@ -0,0 +1,60 @@
+import socket
+
+import pytest
+
+
+def test_new_market_prices_invalidate_cached_lists(app_module):
+    conn = app_module.get_db_connection()
+    conn.execute('DELETE FROM market_prices')  # no fresh prices anywhere: the next lookup refreshes
+    conn.commit()
+    conn.close()
+    app_module.shared_cache.set('market', 'Idukki', [{"crop_name": "Pepper", "price_per_kg": 1.0}])
+    app_module.get_market_prices('Nowhere')
+    assert app_module.shared_cache.get('market', 'Idukki') is None
+
+
+def test_only_msgpack_payloads_are_decoded(app_module):
+    assert app_module.cache_loads(app_module.cache_dumps({"a": [1, 2]})) == {"a": [1, 2]}
+    with pytest.raises(ValueError):
+        app_module.cache_loads(b'M-\x00')
+
+
+def test_redis_backend_backs_off_after_failure(app_module, monkeypatch):
+    listener = socket.socket()
+    listener.bind(('127.0.0.1', 0))
+    port = listener.getsockname()[1]
+    listener.close()  # nothing listens on this port now
+
+    backend = app_module.RedisCacheBackend(f"redis://127.0.0.1:{port}/0", cooldown=60)
+    with pytest.raises(app_module.CacheUnavailable):
+        backend.get('k')
+
+    attempts = []
+    monkeypatch.setattr(backend, '_connect', lambda timeout: attempts.append(timeout))
+    with pytest.raises(app_module.CacheUnavailable):
+        backend.get('k')
+    assert attempts == []
+
+
+def test_uncovered_district_does_not_keep_refreshing_prices(app_module):
+    app_module.get_market_prices('Ernakulam')
+    version = app_module.shared_cache._version('market')
+    conn = app_module.get_db_connection()
+    rows = conn.execute('SELECT COUNT(*) FROM market_prices').fetchone()[0]
+    for _ in range(10):
+        assert app_module.get_market_prices('Ernakulam')
+        app_module.shared_cache.delete('market', 'Ernakulam')  # force the database path too
+    assert app_module.shared_cache._version('market') == version
+    assert conn.execute('SELECT COUNT(*) FROM market_prices').fetchone()[0] == rows
+    conn.close()
+
+
+def test_shm_namespace_version_survives_eviction(app_module, tmp_path):
+    backend = app_module.SharedMemoryCacheBackend(str(tmp_path / "cache.shm"), 16, 256)
+    cache = app_module.SharedCache(backend, prefix="t")
+    for _ in range(3):
+        cache.invalidate('weather')
+    for i in range(500):
+        cache.set('weather', f"cell-{i}", {"i": i}, ttl=600)
+    assert cache._version('weather') == 3
+    assert cache.invalidate('weather') == 4
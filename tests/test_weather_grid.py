@@ -0,0 +1,43 @@
+import pytest
+
+CSV = """pincode,office,district,latitude,longitude
+680001,Thrissur,Thrissur,10.5276,76.2144
+680121,Irinjalakuda,Thrissur,10.3420,76.2110
+673001,Kozhikode,Kozhikode,11.2588,75.7804
+673121,Kalpetta,Wayanad,11.6085,76.0830
+"""
+
+
+@pytest.fixture
+def grid(app_module, tmp_path):
+    path = tmp_path / "pincodes.csv"
+    path.write_text(CSV, encoding="utf-8")
+    return app_module.WeatherGrid.load(str(path), 0.1)
+
+
+@pytest.mark.parametrize("name", ["Thrissur", "thrissur district", "Trichur", "Thrissur, Kerala", " THRISUR "])
+def test_district_spellings_normalize_to_one_name(app_module, name):
+    assert app_module.normalize_place(name) == "thrissur"
+
+
+def test_exact_pincode_resolves_to_its_own_cell(grid):
+    assert grid.resolve("673121") == grid.cell_at(11.6085, 76.0830)
+    assert grid.resolve("673121")["label"] == "Wayanad"
+
+
+def test_unknown_pincode_uses_prefix_only_within_one_district(grid):
+    assert grid.resolve("680999") is not None  # 680xxx is all Thrissur
+    assert grid.resolve("673122") is None      # 673xxx mixes Kozhikode and Wayanad
+    assert grid.resolve("999999") is None
+
+
+def test_district_name_resolves_to_district_centroid(grid):
+    assert grid.resolve("Wayanad") == grid.resolve("673121")
+    assert grid.resolve("Calicut") == grid.resolve("Kozhikode district")
+    assert grid.resolve("Atlantis") is None
+
+
+def test_spelling_variants_share_one_weather_cache_key(app_module):
+    keys = {app_module.weather_cache_key(name) for name in ("Thrissur", "Trichur", "thrissur district")}
+    assert len(keys) == 1
+    assert keys.pop().startswith("cell:")